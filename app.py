@@ -1,30 +1,25 @@
 import streamlit as st
-import gspread
-import json
-import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
+import threading
+import matching
+from storage import user_index
 
 # ✅ ตั้งค่า Streamlit Page
 st.set_page_config(page_title="Fast Labor Login", page_icon="", layout="centered")
 
-# ✅ ตั้งค่า Google Sheets API
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# ✅ โหลดโมเดล AI Matching ล่วงหน้าใน background (ครั้งเดียวต่อ server process, เมื่อตั้ง FASTLABOR_WARM_UP=1)
+@st.cache_resource
+def _warm_up_matching():
+    if matching.WARM_UP:
+        threading.Thread(target=matching.warm_up, daemon=True).start()
 
-try:
-    # ✅ โหลด credentials จาก Cloud (ผ่าน st.secrets) หรือ local
-    if "gcp" in st.secrets and "credentials" in st.secrets["gcp"]:
-        credentials_dict = json.loads(st.secrets["gcp"]["credentials"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
+_warm_up_matching()
 
-    client = gspread.authorize(creds)
-    sheet = client.open("fastlabor").sheet1
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
+# ✅ ดัชนีผู้ใช้ในหน่วยความจำ (storage.py) — สร้างครั้งเดียวต่อ server process
+try:
+    users = user_index()
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถเชื่อมต่อกับ Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถเชื่อมต่อกับฐานข้อมูล: {e}")
     st.stop()
 
 # ✅ ตั้งค่า session state
@@ -49,10 +44,7 @@ st.markdown(
 
 # ✅ ฟังก์ชันตรวจสอบการล็อกอิน
 def check_login(email, password):
-    if "email" in df.columns and "password" in df.columns:
-        user_data = df[(df["email"] == email) & (df["password"] == password)]
-        return not user_data.empty
-    return False
+    return users.check(email, password)
 
 # ✅ ถ้า login แล้ว ให้ไปหน้า home.py
 if st.session_state["logged_in"]:
@@ -0,0 +1,287 @@
+# bench_matching.py
+"""
+Stage-by-stage benchmark of the matching pipeline on synthetic data.
+
+    python bench_matching.py                                # 1k / 10k / 100k, stub encoder
+    python bench_matching.py --sizes 1000 --out bench.json
+    python bench_matching.py --encoder model                # the real all-mpnet-base-v2
+    python bench_matching.py --baseline bench.json          # exit 1 on a regression
+    FASTLABOR_EMBED_BACKEND=onnx-int8 python bench_matching.py --encoder model --parity 1000
+        # also compare that backend's embeddings with PyTorch's; exit 1 below the minimums
+
+post_job / find_job frames are generated with the storage.SCHEMA columns:
+Thai job types, real province / district / subdistrict names (regions.py),
+"A to B" date ranges, shift times and wages.  Each scale times, in order:
+
+    text         row -> text assembly              (_row_texts)
+    embed        encoder, cold embedding cache     (_encode_texts)
+    embed_cached the same texts again              (cache hits only)
+    encode       encode_job_df + encode_worker_df  (cached vectors)
+    index_build  JobIndex.from_df over the jobs
+    prefilter    schedule / distance candidate sets (_allowed)
+    search       FAISS search for the query workers
+    features     FEATURES for every (worker, hit) pair
+    score        SCORER over those features
+    topn         top-n selection (and topn_dedupe, one per employer email)
+    recommend    recommend_batch end to end
+
+Query stages report the best of --repeat runs.  The stub encoder hashes
+each text to a 768-d vector clustered by job type, so it runs offline in
+seconds.  Results are printed (or written with --out) as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# a throwaway embedding cache, so "embed" is always measured cold
+os.environ.setdefault("FASTLABOR_EMBED_CACHE", tempfile.mkdtemp(prefix="fastlabor-bench-"))
+
+import faiss
+import numpy as np
+import pandas as pd
+
+import matching
+import regions
+from storage import SCHEMA
+
+# ------------------------------------------------------------------ #
+# 1) Synthetic data
+# ------------------------------------------------------------------ #
+JOB_TYPES = {
+    "แม่บ้าน":           ["ทำความสะอาดห้องพัก", "ทำความสะอาดสำนักงาน", "ซักรีด"],
+    "พนักงานขับรถ":      ["ขับรถตู้รับส่งพนักงาน", "ส่งของในเมือง", "GPS;ขับรถตู้"],
+    "พนักงานเสิร์ฟ":      ["เสิร์ฟอาหารร้านอาหาร", "งานจัดเลี้ยง"],
+    "พนักงานก่อสร้าง":    ["ผสมปูน", "ก่ออิฐฉาบปูน", "ยกของหนัก"],
+    "ช่างไฟฟ้า":          ["เดินสายไฟ", "ซ่อมปลั๊กและสวิตช์"],
+    "ช่างประปา":          ["ซ่อมท่อน้ำรั่ว", "ติดตั้งสุขภัณฑ์"],
+    "คนสวน":             ["ตัดหญ้า", "ดูแลสวน"],
+    "พี่เลี้ยงเด็ก":        ["ดูแลเด็กเล็ก", "รับส่งเด็กนักเรียน"],
+    "พนักงานคลังสินค้า":   ["แพ็คสินค้า", "ขับรถยก"],
+    "พนักงานล้างจาน":     ["ล้างจานร้านอาหาร"],
+}
+SHIFTS = [("08:00:00", "17:00:00"), ("09:00:00", "18:00:00"), ("06:00:00", "14:00:00"),
+          ("14:00:00", "22:00:00"), ("22:00:00", "06:00:00"), ("10:00:00", "15:00:00")]
+START_DATE = date(2025, 1, 1)
+
+
+def _places(rng: np.random.Generator, n: int) -> np.ndarray:
+    """n (province, district, subdistrict, zip) rows, Bangkok-heavy like the real data."""
+    tree = regions._tree()
+    flat = [(p, d, s, v[0]) for p, ds in tree.items() for d, ss in ds.items() for s, v in ss.items()]
+    weight = np.array([5.0 if p == "กรุงเทพมหานคร" else 1.0 for p, *_ in flat])
+    return np.array(flat, dtype=object)[rng.choice(len(flat), n, p=weight / weight.sum())]
+
+
+def _schedule(rng: np.random.Generator, n: int) -> dict[str, np.ndarray]:
+    start = rng.integers(0, 180, n)
+    length = rng.choice([0, 0, 0, 1, 2, 6], n)
+    fmt = lambda days: np.array([(START_DATE + timedelta(int(d))).isoformat() for d in days], dtype=object)
+    shift = rng.integers(0, len(SHIFTS), n)
+    return {
+        "job_date": fmt(start) + " to " + fmt(start + length),
+        "start_time": np.array([SHIFTS[i][0] for i in shift], dtype=object),
+        "end_time": np.array([SHIFTS[i][1] for i in shift], dtype=object),
+    }
+
+
+def _common(rng: np.random.Generator, n: int, prefix: str) -> dict[str, np.ndarray]:
+    types = np.array(list(JOB_TYPES), dtype=object)[rng.integers(0, len(JOB_TYPES), n)]
+    place = _places(rng, n)
+    people = rng.integers(0, max(n // 3, 1), n)          # some people post / search more than once
+    return {
+        "first_name": np.array([f"{prefix}{i}" for i in people], dtype=object),
+        "last_name": np.full(n, "ทดสอบ", dtype=object),
+        "email": np.array([f"{prefix}{i}@example.com" for i in people], dtype=object),
+        "gender": rng.choice(["ชาย", "หญิง"], n),
+        "job_type": types,
+        "job_address": np.full(n, "-", dtype=object),
+        "province": place[:, 0], "district": place[:, 1], "subdistrict": place[:, 2],
+        "zip_code": place[:, 3],
+        **_schedule(rng, n),
+    }
+
+
+def synth_jobs(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    cols = _common(rng, n, "employer")
+    cols["job_id"] = np.array([f"PJ{i + 1}" for i in range(n)], dtype=object)
+    cols["job_detail"] = np.array([rng.choice(JOB_TYPES[t]) for t in cols["job_type"]], dtype=object)
+    cols["salary"] = (rng.integers(30, 150, n) * 10).astype(str)
+    return pd.DataFrame(cols)[SCHEMA["post_job"]]
+
+
+def synth_workers(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    cols = _common(rng, n, "worker")
+    cols["findjob_id"] = np.array([f"FJ{i + 1}" for i in range(n)], dtype=object)
+    cols["skills"] = np.array([rng.choice(JOB_TYPES[t]) for t in cols["job_type"]], dtype=object)
+    start = rng.integers(30, 120, n) * 10
+    cols["start_salary"] = start.astype(str)
+    cols["range_salary"] = (start + rng.integers(0, 40, n) * 10).astype(str)
+    return pd.DataFrame(cols)[SCHEMA["find_job"]]
+
+# ------------------------------------------------------------------ #
+# 2) Stub encoder
+# ------------------------------------------------------------------ #
+STUB_DIM = 768
+
+
+def _seeded(text: str) -> np.random.Generator:
+    return np.random.default_rng(int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little"))
+
+
+def stub_encode(texts: list[str]) -> np.ndarray:
+    """Deterministic vectors: a per-job-type centre (first word) plus per-text noise."""
+    out = np.empty((len(texts), STUB_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        out[i] = _seeded(text.split(" ", 1)[0]).standard_normal(STUB_DIM)
+        out[i] += 0.8 * _seeded(text).standard_normal(STUB_DIM)
+    return out
+
+# ------------------------------------------------------------------ #
+# 3) Timing
+# ------------------------------------------------------------------ #
+def _timed(stages: dict, name: str, fn, repeat: int = 1):
+    """Run fn `repeat` times, record the best wall time in seconds, return its last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    stages[name] = round(best, 6)
+    return result
+
+
+def run_scale(size: int, args: argparse.Namespace) -> dict:
+    rng = np.random.default_rng(args.seed)
+    jobs_raw, workers_raw = synth_jobs(size, rng), synth_workers(size, rng)
+    stages: dict[str, float] = {}
+
+    texts = _timed(stages, "text", lambda: (
+        matching._row_texts(jobs_raw.copy(), matching._TEXT_COL_JOBS) +
+        matching._row_texts(workers_raw.copy(), matching._TEXT_COL_WORKERS)
+    ))
+    _timed(stages, "embed", lambda: matching._encode_texts(texts))
+    _timed(stages, "embed_cached", lambda: matching._encode_texts(texts))
+    jobs, workers = _timed(stages, "encode", lambda: (
+        matching.encode_job_df(jobs_raw), matching.encode_worker_df(workers_raw)
+    ))
+    index = _timed(stages, "index_build", lambda: matching.JobIndex.from_df(jobs, kind=args.index))
+
+    queries = workers.sample(min(args.queries, len(workers)), random_state=args.seed)
+    r = args.repeat
+    allowed = _timed(stages, "prefilter", lambda: matching._allowed(
+        index, queries, args.radius_km, matching.TIME_FILTER), r)
+    sims, pos, cands = _timed(stages, "search", lambda: index._search(queries["vec"], args.k, allowed), r)
+    feats = _timed(stages, "features", lambda: matching._feature_arrays(queries, cands, pos, sims), r)
+    scores = _timed(stages, "score", lambda: matching._score(feats, args.scorer), r)
+    scores[pos < 0] = -np.inf
+    keys = cands.rows["email"].to_numpy()[np.where(pos >= 0, pos, 0)]
+    _timed(stages, "topn", lambda: matching._top_n(scores.copy(), args.n), r)
+    _timed(stages, "topn_dedupe", lambda: matching._top_n(scores.copy(), args.n, keys), r)
+    out = _timed(stages, "recommend", lambda: matching.recommend_batch(
+        queries, index=index, k=args.k, n=args.n, scorer=args.scorer, radius_km=args.radius_km), r)
+
+    return {
+        "size": size,
+        "queries": len(queries),
+        "hits_per_query": float((pos >= 0).sum(axis=1).mean()) if pos.size else 0.0,
+        "results": len(out),
+        "stages": stages,
+    }
+
+# ------------------------------------------------------------------ #
+# 4) Regression check against an earlier run
+# ------------------------------------------------------------------ #
+def regressions(current: dict, baseline: dict, tolerance: float, floor: float = 0.001) -> list[str]:
+    """Stages more than `tolerance` (and `floor` seconds) slower than in `baseline`."""
+    before = {r["size"]: r["stages"] for r in baseline.get("results", [])}
+    found = []
+    for res in current["results"]:
+        for stage, t in res["stages"].items():
+            old = before.get(res["size"], {}).get(stage)
+            if old is not None and t > old * (1 + tolerance) and t - old > floor:
+                found.append(f"{res['size']:>7} {stage:<13} {old:.4f}s -> {t:.4f}s (+{(t / old - 1):.0%})")
+    return found
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--queries", type=int, default=1_000, help="workers queried per scale")
+    ap.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    ap.add_argument("--index", choices=matching.INDEX_KINDS, default=matching.INDEX_KIND)
+    ap.add_argument("--scorer", choices=["linear", "lgb"], default=matching.SCORER)
+    ap.add_argument("--radius-km", type=float, default=matching.GEO_RADIUS_KM)
+    ap.add_argument("-k", type=int, default=50)
+    ap.add_argument("-n", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write the JSON here instead of stdout")
+    ap.add_argument("--baseline", help="earlier --out file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown per stage")
+    ap.add_argument("--parity", type=int, default=0, metavar="TEXTS",
+                    help="check FASTLABOR_EMBED_BACKEND against PyTorch on this many synthetic texts")
+    ap.add_argument("--parity-min-cos", type=float, default=0.98)
+    ap.add_argument("--parity-min-overlap", type=float, default=0.8, help="top-10 neighbour agreement")
+    args = ap.parse_args(argv)
+
+    if args.encoder == "stub":
+        matching._encode_uncached = stub_encode
+
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "faiss": faiss.__version__,
+            "encoder": args.encoder, "backend": matching.EMBED_BACKEND,
+            "index": args.index, "scorer": args.scorer,
+            "time_filter": matching.TIME_FILTER, "radius_km": args.radius_km,
+            "k": args.k, "n": args.n, "repeat": args.repeat, "seed": args.seed,
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        report["results"].append(run_scale(size, args))
+        print(f"{size:>7} rows: " + ", ".join(f"{k}={v:.3f}s" for k, v in report["results"][-1]["stages"].items()),
+              file=sys.stderr)
+
+    failed = []
+    if args.parity:
+        rng = np.random.default_rng(args.seed)
+        half = (args.parity + 1) // 2
+        texts = (matching._row_texts(synth_jobs(half, rng), matching._TEXT_COL_JOBS) +
+                 matching._row_texts(synth_workers(half, rng), matching._TEXT_COL_WORKERS))[:args.parity]
+        report["parity"] = parity = matching.backend_parity(texts, k=10)
+        if parity["min_cos"] < args.parity_min_cos:
+            failed.append(f"min cosine {parity['min_cos']:.4f} < {args.parity_min_cos}")
+        if parity.get("top10_overlap", 1.0) < args.parity_min_overlap:
+            failed.append(f"top-10 overlap {parity['top10_overlap']:.3f} < {args.parity_min_overlap}")
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    for line in failed:
+        print(f"PARITY {matching.EMBED_BACKEND} " + line, file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            slower = regressions(report, json.load(fh), args.tolerance)
+        for line in slower:
+            print("REGRESSION " + line, file=sys.stderr)
+        failed += slower
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
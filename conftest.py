@@ -0,0 +1,27 @@
+# conftest.py
+"""
+pytest setup: a throwaway embedding cache and index directory per run, and
+the `stub_encoder` fixture (bench_matching.stub_encode), so the tests never
+download the sentence-transformers model.
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("FASTLABOR_EMBED_CACHE", tempfile.mkdtemp(prefix="fastlabor-test-"))
+os.environ.setdefault("FASTLABOR_INDEX_DIR", tempfile.mkdtemp(prefix="fastlabor-test-index-"))
+os.environ.setdefault("FASTLABOR_STORAGE", "sqlite")
+
+import pytest
+
+# test_matching.py is a script run by hand against the real model and CSVs
+collect_ignore = ["test_matching.py"]
+
+
+@pytest.fixture
+def stub_encoder(monkeypatch):
+    import bench_matching
+    import matching
+
+    monkeypatch.setattr(matching, "_encode_uncached", bench_matching.stub_encode)
+    return bench_matching.stub_encode
@@ -0,0 +1,185 @@
+# embedding_store.py
+"""
+Content-addressed embedding store backed by a memory-mapped float32 file.
+
+Every vector is keyed by sha1(model name + text), so a row is only sent
+to the encoder the first time its text is seen.  Layout under `root`:
+  • <model>.f32   -> raw little-endian float32 rows, read via np.memmap
+  • <model>.keys  -> "dim=<d>" header, then one hex key per line
+                     (line i+1 of .keys ↔ row i of .f32)
+
+Both files are append-only and may be shared by several processes (the
+Streamlit server, train_matching_model.py, the bench): appends happen under
+an exclusive flock on <model>.lock and take their row offset from the
+files, and every lookup first reads the keys other processes appended.
+A torn write (vectors flushed but keys not, or vice versa) is trimmed to
+the shorter of the two by the next writer.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:                  # Windows: single-process use only
+    fcntl = None
+
+import numpy as np
+
+# ------------------------------------------------------------------ #
+# 1) Paths & key helper
+# ------------------------------------------------------------------ #
+DEFAULT_ROOT = Path(
+    os.environ.get("FASTLABOR_EMBED_CACHE", Path(__file__).parent / ".embed_cache")
+)
+
+_DTYPE = np.dtype("<f4")
+
+
+def text_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def model_slug(model_name: str) -> str:
+    """`model_name` as a file / directory name."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+# ------------------------------------------------------------------ #
+# 2) Store
+# ------------------------------------------------------------------ #
+class EmbeddingStore:
+    def __init__(self, model_name: str, root: str | Path = DEFAULT_ROOT):
+        self.model_name = model_name
+        self.root = Path(root)
+        slug = model_slug(model_name)
+        self._vec_path = self.root / f"{slug}.f32"
+        self._key_path = self.root / f"{slug}.keys"
+        self._lock_path = self.root / f"{slug}.lock"
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._key_off = 0                 # bytes of .keys already read into _rows
+        self._dim: int | None = None
+        self._mmap: np.memmap | None = None
+        with self._lock, self._flock(exclusive=True):
+            self._sync(writer=True)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, text: str) -> bool:
+        return text_key(self.model_name, text) in self._rows
+
+    @property
+    def dim(self) -> int | None:
+        return self._dim
+
+    # -------------------------------------------------------------- #
+    @contextmanager
+    def _flock(self, exclusive: bool):
+        if fcntl is None or not self.root.exists():
+            yield
+            return
+        with open(self._lock_path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _sync(self, writer: bool = False) -> None:
+        """
+        Read keys appended since the last call (by any process); call with
+        the file lock held.  A `writer` (exclusive lock) also trims a torn
+        tail so that .keys and .f32 hold the same number of rows.
+        """
+        if not self._key_path.exists():
+            return
+        with open(self._key_path, "rb") as fh:
+            fh.seek(self._key_off)
+            tail = fh.read()
+        lines = tail[:tail.rfind(b"\n") + 1].decode("ascii").splitlines(keepends=True)
+        header = b""
+        if self._key_off == 0:
+            if not lines or not lines[0].startswith("dim="):
+                return
+            header, lines = lines[0].encode(), lines[1:]
+            self._dim = int(header[4:])
+        row_bytes = _DTYPE.itemsize * self._dim
+        vec_size = self._vec_path.stat().st_size if self._vec_path.exists() else 0
+        n_vec = vec_size // row_bytes
+        start = len(self._rows)
+        usable = lines[:max(0, n_vec - start)]
+        consumed = self._key_off + len(header) + sum(len(ln) for ln in usable)
+        if writer and (consumed != self._key_off + len(tail) or vec_size != (start + len(usable)) * row_bytes):
+            with open(self._key_path, "r+b") as fh:
+                fh.truncate(consumed)
+            with open(self._vec_path, "r+b") as fh:
+                fh.truncate((start + len(usable)) * row_bytes)
+        self._key_off = consumed
+        if usable:
+            self._rows.update((ln.rstrip("\n"), start + i) for i, ln in enumerate(usable))
+            self._remap()
+
+    def _remap(self) -> None:
+        n = len(self._rows)
+        self._mmap = (
+            np.memmap(self._vec_path, dtype=_DTYPE, mode="r", shape=(n, self._dim))
+            if n else None
+        )
+
+    def _append(self, keys: list[str], vecs: np.ndarray) -> None:
+        """Append rows; call with the exclusive file lock held, right after _sync(writer=True)."""
+        vecs = np.ascontiguousarray(vecs, dtype=_DTYPE)
+        if self._dim is None:
+            self._dim = int(vecs.shape[1])
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._key_path.write_text(f"dim={self._dim}\n")
+            self._vec_path.write_bytes(b"")
+            self._key_off = self._key_path.stat().st_size
+        elif vecs.shape[1] != self._dim:
+            raise ValueError(
+                f"Embedding dim {vecs.shape[1]} does not match store dim {self._dim}"
+            )
+        start = self._vec_path.stat().st_size // (_DTYPE.itemsize * self._dim)
+        if start != len(self._rows):
+            raise RuntimeError(f"{self._vec_path} has {start} rows, keys say {len(self._rows)}")
+        with open(self._vec_path, "ab") as fh:
+            fh.write(vecs.tobytes())
+        block = ("\n".join(keys) + "\n").encode("ascii")
+        with open(self._key_path, "ab") as fh:
+            fh.write(block)
+        self._key_off += len(block)
+        self._rows.update((k, start + i) for i, k in enumerate(keys))
+        self._remap()
+
+    # -------------------------------------------------------------- #
+    def encode(self,
+               texts: list[str],
+               encode_fn: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Return one vector per text, calling `encode_fn` only on unseen texts."""
+        keys = [text_key(self.model_name, t) for t in texts]
+        with self._lock:
+            with self._flock(exclusive=False):
+                self._sync()
+            missing = {k: t for k, t in zip(keys, texts) if k not in self._rows}
+            if missing:
+                # the model runs outside the file lock; another process may
+                # store some of the same texts meanwhile
+                vecs = np.asarray(encode_fn(list(missing.values())), dtype=_DTYPE)
+                self.root.mkdir(parents=True, exist_ok=True)
+                with self._flock(exclusive=True):
+                    self._sync(writer=True)
+                    new = [i for i, k in enumerate(missing) if k not in self._rows]
+                    if new:
+                        self._append([list(missing)[i] for i in new], vecs[new])
+            if not keys:
+                return np.empty((0, self._dim or 0), dtype=_DTYPE)
+            rows = np.fromiter((self._rows[k] for k in keys), dtype=np.int64, count=len(keys))
+            return np.asarray(self._mmap[rows], dtype=np.float32)
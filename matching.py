@@ -1,12 +1,110 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import faiss
-from sentence_transformers import SentenceTransformer
+
+import regions
+import timing
+from embedding_store import EmbeddingStore, model_slug
+
+log = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------ #
-# 1) Load embedding model
+# 1) Embedding model (loaded lazily) & on-disk embedding cache
 # ------------------------------------------------------------------ #
-_EMBED_MODEL = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+EMBED_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+EMBED_BACKENDS   = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND    = os.environ.get("FASTLABOR_EMBED_BACKEND", "torch")        # see EMBED_BACKENDS
+ONNX_QCONFIG     = os.environ.get("FASTLABOR_ONNX_QCONFIG", "avx512_vnni")   # or "avx2" / "avx512" / "arm64"
+ONNX_DIR         = Path(os.environ.get("FASTLABOR_ONNX_DIR", Path(__file__).parent / ".onnx_cache"))
+WARM_UP          = os.environ.get("FASTLABOR_WARM_UP", "0") == "1"           # load the model at server start
+if EMBED_BACKEND not in EMBED_BACKENDS:
+    raise ValueError(f"FASTLABOR_EMBED_BACKEND must be one of {EMBED_BACKENDS}, not {EMBED_BACKEND!r}")
+
+
+def _embed_key(backend: str) -> str:
+    """Embedding cache name: vectors from different backends are never mixed."""
+    if backend == "torch":
+        return EMBED_MODEL_NAME
+    return f"{EMBED_MODEL_NAME}@{backend}" + (f"-{ONNX_QCONFIG}" if backend == "onnx-int8" else "")
+
+
+_EMBED_STORE = EmbeddingStore(_embed_key(EMBED_BACKEND))
+
+_EMBED_MODEL = None
+_EMBED_LOCK = threading.Lock()
+
+
+def _load_embed_model(backend: str):
+    """
+    SentenceTransformer on `backend`.  The ONNX ones (sentence-transformers
+    >= 3.2 with its [onnx] extra) are exported once under ONNX_DIR, int8
+    by dynamic quantization for ONNX_QCONFIG, and loaded from there after.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(EMBED_MODEL_NAME)
+    local = ONNX_DIR / model_slug(EMBED_MODEL_NAME)
+    if not (local / "onnx" / "model.onnx").exists():
+        SentenceTransformer(EMBED_MODEL_NAME, backend="onnx").save_pretrained(str(local))
+    file_name = "model.onnx"
+    if backend == "onnx-int8":
+        found = sorted((local / "onnx").glob(f"model_*int8_{ONNX_QCONFIG}.onnx"))
+        if not found:
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            fp32 = SentenceTransformer(str(local), backend="onnx", model_kwargs={"file_name": "onnx/model.onnx"})
+            export_dynamic_quantized_onnx_model(fp32, ONNX_QCONFIG, str(local))
+            found = sorted((local / "onnx").glob(f"model_*int8_{ONNX_QCONFIG}.onnx"))
+        file_name = found[0].name
+    return SentenceTransformer(str(local), backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"})
+
+
+def _get_embed_model():
+    """Process-wide SentenceTransformer on EMBED_BACKEND, imported and loaded on first use."""
+    global _EMBED_MODEL
+    with _EMBED_LOCK:
+        if _EMBED_MODEL is None:
+            _EMBED_MODEL = _load_embed_model(EMBED_BACKEND)
+        return _EMBED_MODEL
+
+
+def warm_up() -> None:
+    """
+    Load the embedding model ahead of the first request (e.g. at server
+    start).  Opt-in (WARM_UP): with warm caches the model may never be
+    needed, and loading it costs memory and CPU on small containers.
+    """
+    _get_embed_model()
+
+
+def backend_parity(texts: list[str], backend: str | None = None, k: int = 10) -> dict[str, float]:
+    """
+    How closely `backend` (default EMBED_BACKEND) reproduces the PyTorch
+    embeddings of `texts`: cosine between the two vectors of each text
+    (min / mean), and the mean share of each text's top-k neighbours among
+    `texts` that both agree on.  Bypasses the embedding cache.
+    """
+    backend = backend or EMBED_BACKEND
+    ref, alt = (
+        _as_unit_matrix(_load_embed_model(b).encode(texts, batch_size=ENCODE_BATCH, show_progress_bar=False))
+        for b in ("torch", backend)
+    )
+    cos = (ref * alt).sum(axis=1)
+    k = min(k, len(texts) - 1)
+    if k < 1:
+        return {"texts": len(texts), "min_cos": float(cos.min()), "mean_cos": float(cos.mean())}
+    hits = [np.argsort(-(v @ v.T), axis=1, kind="stable")[:, 1:k + 1] for v in (ref, alt)]
+    overlap = np.mean([len(np.intersect1d(a, b)) / k for a, b in zip(*hits)])
+    return {"texts": len(texts), "min_cos": float(cos.min()), "mean_cos": float(cos.mean()),
+            f"top{k}_overlap": float(overlap)}
 
 # ------------------------------------------------------------------ #
 # 2) Columns for encoding text
@@ -22,126 +120,1313 @@ _TEXT_COL_WORKERS = [
     "job_date", "start_time", "end_time",
 ]
 
+# kind -> (text columns, schedule envelope columns added by _attach_availability)
+ENCODE_SCHEMAS = {
+    "job":    (_TEXT_COL_JOBS,    ("start_dt",    "end_dt")),
+    "worker": (_TEXT_COL_WORKERS, ("avail_start", "avail_end")),
+}
+
 # ------------------------------------------------------------------ #
 # 3) Text encoding helper
 # ------------------------------------------------------------------ #
+ENCODE_BATCH = int(os.environ.get("FASTLABOR_ENCODE_BATCH", 32))   # texts per forward pass
+ENCODE_PROCS = int(os.environ.get("FASTLABOR_ENCODE_PROCS", 1))    # bulk-encode processes; 0 = one per core
+BULK_MIN     = int(os.environ.get("FASTLABOR_BULK_MIN", 2000))     # unseen texts that go to encode_bulk
+
+
+def _encode_procs(procs: int | None = None) -> int:
+    procs = ENCODE_PROCS if procs is None else procs
+    return procs if procs > 0 else (os.cpu_count() or 1)
+
+
+def _encode_uncached(texts: list[str]) -> np.ndarray:
+    with timing.stage("model", rows=len(texts)):
+        if len(texts) >= BULK_MIN and _encode_procs() > 1:
+            return encode_bulk(texts)
+        return _get_embed_model().encode(texts, batch_size=ENCODE_BATCH, show_progress_bar=False)
+
+
+def encode_bulk(texts: list[str], procs: int | None = None, batch_size: int | None = None) -> np.ndarray:
+    """
+    Embed many texts (backfills, re-embedding after a model change) on
+    `procs` worker processes (default ENCODE_PROCS; 0 = one per core),
+    each with its share of the cores.  Texts are sorted by length so every
+    batch pads to similar lengths; vectors come back in input order.
+    ONNX backends stay in-process (onnxruntime already uses every core).
+    Bypasses the embedding cache.  Call from under `if __name__ == "__main__"`.
+    """
+    procs, batch_size = _encode_procs(procs), batch_size or ENCODE_BATCH
+    if EMBED_BACKEND != "torch":
+        procs = 1
+    order = np.argsort(np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts)), kind="stable")
+    by_len = [texts[i] for i in order]
+    model = _get_embed_model()
+    if procs <= 1 or len(texts) < 2 * batch_size:
+        vecs = model.encode(by_len, batch_size=batch_size, show_progress_bar=False)
+    else:
+        # workers read OMP_NUM_THREADS when they import torch
+        saved = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // procs))
+        try:
+            pool = model.start_multi_process_pool(["cpu"] * procs)
+        finally:
+            if saved is None:
+                os.environ.pop("OMP_NUM_THREADS", None)
+            else:
+                os.environ["OMP_NUM_THREADS"] = saved
+        try:
+            # sentence-transformers >= 5 takes the pool in encode() and
+            # deprecates encode_multi_process
+            if "pool" in inspect.signature(model.encode).parameters:
+                vecs = model.encode(by_len, pool=pool, batch_size=batch_size, show_progress_bar=False)
+            else:
+                vecs = model.encode_multi_process(by_len, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    out = np.empty_like(np.asarray(vecs))
+    out[order] = vecs
+    return out
+
+
 def _encode_texts(texts: list[str]) -> np.ndarray:
-    return _EMBED_MODEL.encode([str(t) for t in texts], show_progress_bar=False)
+    # only texts never seen before (new or edited rows) reach the model;
+    # a text repeated within the batch is looked up once
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object), sort=False)
+    vecs = _EMBED_STORE.encode(list(uniques), _encode_uncached)
+    return vecs if len(uniques) == len(codes) else vecs[codes]
 
 # ------------------------------------------------------------------ #
 # 4) Encoding DataFrames
 # ------------------------------------------------------------------ #
+def _row_texts(df: pd.DataFrame, cols: list[str]) -> list[str]:
+    """One text per row: `cols` as strings (missing -> ""), space-joined; fills `cols` in place."""
+    for col in cols:
+        df[col] = df[col].fillna("").astype(str) if col in df else ""
+    # column-wise: one list per column, joined in C (no per-row Series)
+    return [" ".join(parts) for parts in zip(*(df[col].tolist() for col in cols))]
+
+
+def encode_df(df: pd.DataFrame, kind: str) -> pd.DataFrame:
+    """
+    Copy of `df` ready for indexing / ranking, per ENCODE_SCHEMAS[kind]:
+    `vec` (embedding of the text columns) plus the schedule and lat / lon
+    columns.  Rows whose text is already in the embedding cache skip the model.
+    """
+    cols, (lo, hi) = ENCODE_SCHEMAS[kind]
+    name = f"encode_{kind}_df"
+    with timing.profiled(name), timing.stage(name, rows=len(df)):
+        df = df.copy()
+        with timing.stage("text"):
+            texts = _row_texts(df, cols)
+        with timing.stage("embed", rows=len(texts)):
+            df["vec"] = list(_encode_texts(texts))
+        with timing.stage("enrich"):
+            return _attach_latlon(_attach_availability(df, lo, hi))
+
+
 def encode_job_df(jobs_df: pd.DataFrame) -> pd.DataFrame:
-    df = jobs_df.copy()
-    for col in _TEXT_COL_JOBS:
-        df[col] = df.get(col, "").fillna("").astype(str)
-    df["__text"] = df[_TEXT_COL_JOBS].apply(lambda row: " ".join(row.values), axis=1)
-    df["vec"] = list(_encode_texts(df["__text"].tolist()))
-    df.drop(columns="__text", inplace=True)
-    if {"job_date","start_time","end_time"}.issubset(df.columns):
-        df["job_date"] = pd.to_datetime(df["job_date"], errors="coerce").dt.date
-        df["start_dt"] = pd.to_datetime(df["job_date"].astype(str) + " " + df["start_time"], errors="coerce")
-        df["end_dt"]   = pd.to_datetime(df["job_date"].astype(str) + " " + df["end_time"],   errors="coerce")
-    return df
+    return encode_df(jobs_df, "job")
 
 
 def encode_worker_df(workers_df: pd.DataFrame) -> pd.DataFrame:
-    df = workers_df.copy()
-    for col in _TEXT_COL_WORKERS:
-        df[col] = df.get(col, "").fillna("").astype(str)
-    df["__text"] = df[_TEXT_COL_WORKERS].apply(lambda row: " ".join(row.values), axis=1)
-    df["vec"]    = list(_encode_texts(df["__text"].tolist()))
-    df.drop(columns="__text", inplace=True)
-    if {"job_date","start_time","end_time"}.issubset(df.columns):
-        df["job_date"]    = pd.to_datetime(df["job_date"],    errors="coerce").dt.date
-        df["avail_start"] = pd.to_datetime(df["job_date"].astype(str) + " " + df["start_time"], errors="coerce")
-        df["avail_end"]   = pd.to_datetime(df["job_date"].astype(str) + " " + df["end_time"],   errors="coerce")
+    return encode_df(workers_df, "worker")
+
+
+def _minutes(times: pd.Series) -> np.ndarray:
+    """"HH:MM[:SS]" -> minutes after midnight (NaN if unparseable)."""
+    t = pd.to_datetime("2000-01-01 " + times.fillna("").astype(str).str.strip(), errors="coerce")
+    return (t.dt.hour * 60 + t.dt.minute + t.dt.second / 60).to_numpy(dtype=float)
+
+
+def _attach_availability(df: pd.DataFrame, lo: str, hi: str) -> pd.DataFrame:
+    """
+    Parse `job_date` ("YYYY-MM-DD" or the forms' "A to B" range) and
+    start_time / end_time into an availability: dates `date_from` ..
+    `date_to` with the same daily window `win_start` .. `win_end` (minutes
+    after midnight; past 1440 for overnight shifts).  `lo` / `hi` get the
+    envelope datetimes (first day + start, last day + end).
+    """
+    if "job_date" not in df.columns:
+        return df
+    if df.empty:                                             # split(expand=True) gives no columns
+        for col in ("date_from", "date_to", lo, hi):
+            df[col] = pd.Series(dtype="datetime64[ns]")
+        df["win_start"] = df["win_end"] = np.empty(0)
+        return df
+    parts = df["job_date"].fillna("").astype(str).str.split(r"\s+to\s+", n=1, regex=True, expand=True)
+    d0 = pd.to_datetime(parts[0].str.strip(), errors="coerce")
+    d1 = pd.to_datetime(parts[1].str.strip(), errors="coerce").fillna(d0) if parts.shape[1] > 1 else d0
+    d0, d1 = d0.where(~(d1 < d0), d1), d1.where(~(d1 < d0), d0)
+    w0 = _minutes(df["start_time"]) if "start_time" in df.columns else np.full(len(df), np.nan)
+    w1 = _minutes(df["end_time"]) if "end_time" in df.columns else np.full(len(df), np.nan)
+    w0 = np.where(np.isnan(w0), 0.0, w0)                     # no time -> whole day
+    w1 = np.where(np.isnan(w1), _DAY_MIN, w1)
+    w1 = np.where(w1 <= w0, w1 + _DAY_MIN, w1)               # overnight shift
+    df["date_from"], df["date_to"] = d0.dt.normalize(), d1.dt.normalize()
+    df["win_start"], df["win_end"] = w0, w1
+    df[lo] = df["date_from"] + pd.to_timedelta(w0, unit="min")
+    df[hi] = df["date_to"] + pd.to_timedelta(w1, unit="min")
     return df
 
+
+def _attach_latlon(df: pd.DataFrame) -> pd.DataFrame:
+    """`lat` / `lon` from the subdistrict (else district, province) centroid."""
+    if {"lat", "lon"}.issubset(df.columns) or "province" not in df.columns:
+        return df
+    keys = pd.MultiIndex.from_arrays(
+        [df.get(c, pd.Series("", index=df.index)).fillna("").astype(str).str.strip()
+         for c in ("province", "district", "subdistrict")]
+    )
+    uniq = keys.unique()
+    pts = np.array([regions.latlon(*key) or (np.nan, np.nan) for key in uniq], dtype=float).reshape(-1, 2)
+    at = uniq.get_indexer(keys)
+    df["lat"], df["lon"] = pts[at, 0], pts[at, 1]
+    return df
+
+# ------------------------------------------------------------------ #
+# 4b) Availability: date range x daily window, and an interval index
+# ------------------------------------------------------------------ #
+_DAY_MIN = 1440
+TIME_FILTER = os.environ.get("FASTLABOR_TIME_FILTER", "0") == "1"   # hard prefilter; off: time_match only scores
+
+
+def _availability(df: pd.DataFrame) -> tuple[np.ndarray, ...] | None:
+    """(day_from, day_to, win_start, win_end) float arrays (days since epoch / minutes; NaN if unknown)."""
+    if "date_from" not in df.columns:
+        if "job_date" not in df.columns:
+            return None
+        df = _attach_availability(df.copy(), "_lo", "_hi")
+    days = [
+        pd.to_datetime(df[c], errors="coerce").to_numpy(dtype="datetime64[D]").astype(float)
+        for c in ("date_from", "date_to")
+    ]
+    for d in days:
+        d[d < -1e12] = np.nan                                # NaT
+    return days[0], days[1], _num(df, "win_start"), _num(df, "win_end")
+
+
+def _windows_overlap(a0, a1, b0, b1):
+    """Daily windows [a0, a1) and [b0, b1) in minutes share time on some day (handles overnight)."""
+    return (
+        (np.maximum(a0, b0) < np.minimum(a1, b1)) |
+        (np.maximum(a0, b0 + _DAY_MIN) < np.minimum(a1, b1 + _DAY_MIN)) |
+        (np.maximum(a0 + _DAY_MIN, b0) < np.minimum(a1 + _DAY_MIN, b1))
+    )
+
+
+def _schedules_overlap(q, c):
+    """Element-wise overlap of two availabilities (tuples from _availability); False if unknown."""
+    return (q[0] <= c[1]) & (c[0] <= q[1]) & _windows_overlap(q[2], q[3], c[2], c[3])
+
+
+class AvailabilityIndex:
+    """
+    Interval index over row availabilities.  Rows are kept sorted both by
+    first and by last day; a query takes the smaller of "starts on/before
+    the query's last day" (prefix) and "ends on/after its first day"
+    (suffix) via binary search, then checks the rest vectorized.  Rows
+    with unknown dates always match.
+    """
+
+    def __init__(self):
+        self._rows: dict[int, tuple[float, float, float, float]] = {}
+        self._unknown: set[int] = set()
+        self._sorted = None
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._unknown)
+
+    def add(self, ids, avail) -> None:
+        for i, d0, d1, w0, w1 in zip(ids, *avail):
+            i = int(i)
+            self._unknown.discard(i)
+            if np.isnan(d0) or np.isnan(d1):
+                self._rows.pop(i, None)
+                self._unknown.add(i)
+            else:
+                self._rows[i] = (d0, d1, w0, w1)
+        self._sorted = None
+
+    def remove(self, ids) -> None:
+        for i in ids:
+            self._rows.pop(int(i), None)
+            self._unknown.discard(int(i))
+        self._sorted = None
+
+    def _arrays(self):
+        if self._sorted is None:
+            ids = np.fromiter(self._rows, dtype=np.int64, count=len(self._rows))
+            vals = np.array(list(self._rows.values()), dtype=float).reshape(-1, 4)
+            by_start, by_end = np.argsort(vals[:, 0], kind="stable"), np.argsort(vals[:, 1], kind="stable")
+            self._sorted = (ids, vals, by_start, vals[by_start, 0], by_end, vals[by_end, 1])
+        return self._sorted
+
+    def overlapping(self, day_from: float, day_to: float, win_start: float, win_end: float) -> np.ndarray:
+        """Row ids whose availability overlaps the query's (plus rows with unknown dates)."""
+        ids, vals, by_start, starts, by_end, ends = self._arrays()
+        n_prefix = np.searchsorted(starts, day_to, side="right")
+        n_suffix = len(ends) - np.searchsorted(ends, day_from, side="left")
+        cand = by_start[:n_prefix] if n_prefix <= n_suffix else by_end[len(ends) - n_suffix:]
+        v = vals[cand]
+        q = (day_from, day_to, win_start, win_end)
+        hit = _schedules_overlap(q, (v[:, 0], v[:, 1], v[:, 2], v[:, 3]))
+        out = ids[cand[hit]]
+        if self._unknown:
+            out = np.concatenate([out, np.fromiter(self._unknown, dtype=np.int64)])
+        return out
+
 # ------------------------------------------------------------------ #
-# 5) Build FAISS index
+# 5) Long-lived FAISS index keyed by row id
 # ------------------------------------------------------------------ #
-def _build_faiss_index(mat: np.ndarray):
-    dim = mat.shape[1]
-    index = faiss.IndexFlatIP(dim)
+INDEX_KIND      = os.environ.get("FASTLABOR_INDEX", "flat")      # see INDEX_KINDS
+INDEX_KINDS     = ("flat", "ivf", "hnsw", "fp16", "sq8", "ivfpq")
+VEC_DTYPE       = np.dtype(os.environ.get("FASTLABOR_VEC_DTYPE", "float32"))   # CandidateStore copy
+IVF_NLIST       = int(os.environ.get("FASTLABOR_IVF_NLIST", 256))
+IVF_NPROBE      = int(os.environ.get("FASTLABOR_IVF_NPROBE", 16))
+HNSW_M          = int(os.environ.get("FASTLABOR_HNSW_M", 32))
+HNSW_EF_SEARCH  = int(os.environ.get("FASTLABOR_HNSW_EF_SEARCH", 64))
+PQ_M            = int(os.environ.get("FASTLABOR_PQ_M", 192))     # ivfpq bytes per vector
+RETRAIN_BELOW   = 4096      # trained kinds retrain each time a pool smaller than this doubles
+EXACT_BELOW     = int(os.environ.get("FASTLABOR_EXACT_BELOW", 4096))   # prefiltered sets scored exactly
+INDEX_DIR       = Path(os.environ.get("FASTLABOR_INDEX_DIR", Path(__file__).parent / ".index_cache"))
+GEO_RADIUS_KM   = float(os.environ.get("FASTLABOR_RADIUS_KM", 0)) or None   # None = no spatial prefilter
+GEO_CELL_DEG    = 0.25                                                    # ~28 km grid cells
+
+
+def _as_unit_matrix(vecs) -> np.ndarray:
+    mat = np.array(np.vstack(vecs), dtype=np.float32)
     faiss.normalize_L2(mat)
-    index.add(mat)
-    return index
+    return mat
+
+
+def _haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+class GeoGrid:
+    """
+    Uniform lat/lon grid over row ids for radius queries: within() visits
+    only the cells overlapping the query circle, then checks exact
+    haversine distance.  Rows without coordinates are never returned.
+    """
+
+    def __init__(self, cell_deg: float = GEO_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._pts: dict[int, tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pts)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return int(np.floor(lat / self.cell_deg)), int(np.floor(lon / self.cell_deg))
+
+    def add(self, ids, lats, lons) -> None:
+        for i, lat, lon in zip(ids, lats, lons):
+            if np.isnan(lat) or np.isnan(lon):
+                continue
+            self._pts[int(i)] = (float(lat), float(lon))
+            self._cells.setdefault(self._cell(lat, lon), set()).add(int(i))
+
+    def remove(self, ids) -> None:
+        for i in ids:
+            pt = self._pts.pop(int(i), None)
+            if pt is not None:
+                self._cells[self._cell(*pt)].discard(int(i))
+
+    def within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        d_lat = radius_km / 111.0
+        d_lon = radius_km / (111.0 * max(np.cos(np.radians(lat)), 1e-6))
+        (i0, j0), (i1, j1) = self._cell(lat - d_lat, lon - d_lon), self._cell(lat + d_lat, lon + d_lon)
+        ids = [i for ci in range(i0, i1 + 1) for cj in range(j0, j1 + 1)
+               for i in self._cells.get((ci, cj), ())]
+        if not ids:
+            return np.empty(0, dtype=np.int64)
+        pts = np.array([self._pts[i] for i in ids])
+        dist = _haversine_km(lat, lon, pts[:, 0], pts[:, 1])
+        return np.asarray(ids, dtype=np.int64)[dist <= radius_km]
+
+
+_VOCAB: dict[str, int] = {}
+_VOCAB_LOCK = threading.Lock()
+
+
+def _vocab_codes(values: np.ndarray) -> np.ndarray:
+    """Process-wide int code per string, so codes from different frames compare equal."""
+    inv, uniq = pd.factorize(values)
+    with _VOCAB_LOCK:
+        codes = np.fromiter((_VOCAB.setdefault(v, len(_VOCAB)) for v in uniq),
+                            dtype=np.int64, count=len(uniq))
+    return codes[inv] if len(inv) else np.empty(0, dtype=np.int64)
+
+
+class CandidateStore:
+    """
+    Columnar form of encoded rows: unit vectors in one contiguous matrix
+    (float32, or float16 to halve it) and every feature input (job_type / location codes, pay, lat/lon,
+    availability) as a NumPy array, all aligned by position with `rows`
+    (the other columns, without "vec").  Built once when rows enter a
+    JobIndex, so scoring is array gathers only.
+    """
+
+    FIELDS = ("type", "loc", "pay", "lat", "lon", "day_from", "day_to", "win_start", "win_end")
+
+    def __init__(self, rows: pd.DataFrame, vecs: np.ndarray | None, cols: dict[str, np.ndarray]):
+        self.rows = rows
+        self.vecs = vecs
+        self.cols = cols
+
+    @classmethod
+    def empty(cls) -> "CandidateStore":
+        return cls(pd.DataFrame(), None, {f: np.empty(0) for f in cls.FIELDS})
+
+    @classmethod
+    def from_df(cls,
+                df: pd.DataFrame,
+                with_vecs: bool = True,
+                dtype: np.dtype = VEC_DTYPE) -> "CandidateStore":
+        n = len(df)
+        vecs = None
+        if with_vecs and "vec" in df.columns:
+            vecs = _as_unit_matrix(df["vec"]) if n else np.empty((0, 0), dtype=np.float32)
+            vecs = vecs.astype(dtype, copy=False)
+        loc = np.full(n, "", dtype=object)
+        for col in _LOC_COLS:
+            loc = loc + "|" + _norm_place(df, col)
+        avail = _availability(df) or (np.full(n, np.nan),) * 4
+        cols = dict(zip(cls.FIELDS, (
+            _vocab_codes(_norm_str(df, "job_type")), _vocab_codes(loc), _pay(df), *_latlon(df), *avail,
+        )))
+        return cls(df.drop(columns="vec", errors="ignore"), vecs, cols)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.cols[field]
+
+    def avail(self) -> tuple[np.ndarray, ...]:
+        return tuple(self.cols[f] for f in self.FIELDS[5:])
+
+    def append(self, other: "CandidateStore") -> "CandidateStore":
+        if not len(self):
+            return other
+        vecs = None if self.vecs is None or other.vecs is None else np.concatenate([self.vecs, other.vecs])
+        return CandidateStore(pd.concat([self.rows, other.rows]), vecs,
+                              {f: np.concatenate([self.cols[f], other.cols[f]]) for f in self.FIELDS})
+
+    def take(self, sel: np.ndarray) -> "CandidateStore":
+        """Rows at positions / boolean mask `sel`."""
+        return CandidateStore(self.rows.iloc[sel], None if self.vecs is None else self.vecs[sel],
+                              {f: a[sel] for f, a in self.cols.items()})
+
+
+def _as_store(df: pd.DataFrame | CandidateStore) -> CandidateStore:
+    return df if isinstance(df, CandidateStore) else CandidateStore.from_df(df, with_vecs=False)
+
+
+class JobIndex:
+    """
+    Inner-product FAISS index plus the encoded rows it was built from, keyed
+    by `id_col` (positional when None).  Rows can be added, replaced or
+    removed without rebuilding the index.
+
+    kind: "flat"  -> exact IndexFlatIP, 4 bytes per dimension
+          "ivf"   -> IndexIVFFlat, centroids trained on the first batch
+                     (call rebuild() to retrain once the pool has grown)
+          "hnsw"  -> IndexHNSWFlat; removals trigger a rebuild since HNSW
+                     cannot delete in place
+          "fp16"  -> IndexScalarQuantizer, float16 codes (2x smaller)
+          "sq8"   -> IndexScalarQuantizer, 8-bit codes per dimension (4x)
+          "ivfpq" -> IndexIVFPQ, `pq_m` bytes per vector (16x at 768-d)
+    Trained kinds retrain automatically while the pool is small (each
+    time it doubles, up to RETRAIN_BELOW rows).  recall_at_k() and
+    quantization_report() measure what a kind loses against "flat".
+    When `path` is set the index is written there (faiss.write_index)
+    once per change and can be reopened with JobIndex.load(path).
+    Rows live in a CandidateStore (`rows` is its DataFrame part); rows
+    with coordinates are also kept in a GeoGrid for near(), and rows with
+    a schedule in an AvailabilityIndex for available().
+    """
+
+    def __init__(self,
+                 id_col: str | None = "job_id",
+                 kind: str = "flat",
+                 nlist: int = IVF_NLIST,
+                 nprobe: int = IVF_NPROBE,
+                 hnsw_m: int = HNSW_M,
+                 ef_search: int = HNSW_EF_SEARCH,
+                 pq_m: int = PQ_M,
+                 path: str | Path | None = None):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind!r}")
+        self.id_col = id_col
+        self.kind = kind
+        self.nlist, self.nprobe = nlist, nprobe
+        self.hnsw_m, self.ef_search = hnsw_m, ef_search
+        self.pq_m = pq_m
+        self._trained_on = 0                  # rows the quantizer was trained on
+        self.path = Path(path) if path is not None else None
+        self._cands = CandidateStore.empty()
+        self._index = None
+        self._ids: dict[str, int] = {}
+        self._fingerprints: dict[str, int] = {}
+        self._next_id = 0
+        self._geo = GeoGrid()
+        self._avail = AvailabilityIndex()
+        self._lock = threading.RLock()
+        self._depth = 0                       # open _mutation() blocks
+        self._dirty = False
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, id_col: str | None = "job_id", **params) -> "JobIndex":
+        index = cls(id_col=id_col, **params)
+        index.upsert(df)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def rows(self) -> pd.DataFrame:
+        """Indexed rows (without "vec"), labelled by faiss id."""
+        return self._cands.rows
+
+    def _keys(self, df: pd.DataFrame) -> pd.Series:
+        if self.id_col is None:
+            return pd.Series(range(len(df)), index=df.index).astype(str)
+        return df[self.id_col].astype(str)
+
+    # -------------------------------------------------------------- #
+    def _new_faiss_index(self, mat: np.ndarray):
+        dim = mat.shape[1]
+        nlist = max(1, min(self.nlist, len(mat)))
+        if self.kind == "ivf":
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist,
+                                       faiss.METRIC_INNER_PRODUCT)
+            index.train(mat)
+        elif self.kind == "ivfpq":
+            m = max(d for d in range(1, min(self.pq_m, dim) + 1) if dim % d == 0)
+            nbits = int(min(8, max(1, np.log2(len(mat)))))     # small pools: fewer centroids
+            index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, nlist, m, nbits,
+                                     faiss.METRIC_INNER_PRODUCT)
+            index.train(mat if len(mat) >= 2 ** nbits else np.resize(mat, (2 ** nbits, dim)))
+        elif self.kind in ("fp16", "sq8"):
+            qtype = faiss.ScalarQuantizer.QT_fp16 if self.kind == "fp16" else faiss.ScalarQuantizer.QT_8bit
+            index = faiss.IndexIDMap(faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT))
+            index.train(mat)
+        elif self.kind == "hnsw":
+            index = faiss.IndexIDMap(
+                faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            )
+        else:
+            index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        self._trained_on = len(mat)
+        self._apply_search_params(index)
+        return index
+
+    def _apply_search_params(self, index) -> None:
+        if self.kind in ("ivf", "ivfpq"):
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
+        elif self.kind == "hnsw":
+            faiss.downcast_index(index.index).hnsw.efSearch = self.ef_search
+
+    def rebuild(self) -> None:
+        """Recreate the FAISS index from the stored rows (retrains IVF centroids)."""
+        with self._mutation():
+            if self.rows.empty:
+                self._index = None
+                return
+            mat = np.ascontiguousarray(self._cands.vecs, dtype=np.float32)
+            self._index = self._new_faiss_index(mat)
+            self._index.add_with_ids(mat, self.rows.index.to_numpy(dtype=np.int64))
+            self._persist()
+
+    # -------------------------------------------------------------- #
+    def upsert(self, df: pd.DataFrame) -> None:
+        """Add rows of an encoded DataFrame, replacing rows with the same id."""
+        if df.empty:
+            return
+        keys = self._keys(df)
+        keep = ~keys.duplicated(keep="last").to_numpy()
+        df, keys = df[keep], keys[keep]
+        cands = CandidateStore.from_df(df)
+        mat = cands.vecs
+        with self._mutation():
+            self.remove(keys[keys.isin(self._ids.keys())])     # hnsw: may rebuild, to None if emptied
+            if self._index is None:
+                self._index = self._new_faiss_index(mat)
+            fids = np.arange(self._next_id, self._next_id + len(df), dtype=np.int64)
+            self._next_id += len(df)
+            self._index.add_with_ids(mat, fids)
+            self._ids.update(zip(keys, fids.tolist()))
+            self._fingerprints.update(zip(keys, _row_fingerprints(df)))
+            self._geo.add(fids, cands["lat"], cands["lon"])
+            self._avail.add(fids, cands.avail())
+            cands.rows = cands.rows.set_axis(fids, axis=0)
+            self._cands = self._cands.append(cands)
+            if self.kind in ("ivf", "ivfpq", "sq8") and 2 * self._trained_on <= len(self) < RETRAIN_BELOW:
+                self.rebuild()
+            self._persist()
+
+    def remove(self, keys) -> None:
+        keys = [str(k) for k in keys]
+        with self._mutation():
+            fids = [self._ids.pop(k) for k in keys if k in self._ids]
+            if not fids:
+                return
+            for k in keys:
+                self._fingerprints.pop(k, None)
+            self._geo.remove(fids)
+            self._avail.remove(fids)
+            self._cands = self._cands.take(~self.rows.index.isin(fids))
+            if self.kind == "hnsw":
+                self.rebuild()
+            else:
+                self._index.remove_ids(np.asarray(fids, dtype=np.int64))
+            self._persist()
+
+    def sync(self, df: pd.DataFrame) -> None:
+        """Mirror `df`: add new rows, re-add edited ones, drop ids no longer present."""
+        keys = self._keys(df)
+        fps = _row_fingerprints(df)
+        with self._mutation():
+            self.remove(set(self._ids) - set(keys))
+            changed = np.fromiter(
+                (self._fingerprints.get(k) != fp for k, fp in zip(keys, fps)),
+                dtype=bool, count=len(df),
+            )
+            self.upsert(df[changed])
+
+    def near(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Row ids (faiss ids) within `radius_km` of (lat, lon)."""
+        with self._lock:
+            return self._geo.within(lat, lon, radius_km)
+
+    def available(self, day_from: float, day_to: float, win_start: float, win_end: float) -> np.ndarray:
+        """Row ids (faiss ids) whose schedule overlaps the given one (see _availability)."""
+        with self._lock:
+            return self._avail.overlapping(day_from, day_to, win_start, win_end)
+
+    def _search_params(self, sel):
+        if self.kind in ("ivf", "ivfpq"):
+            return faiss.SearchParametersIVF(sel=sel, nprobe=min(self.nprobe, self._index.nlist))
+        if self.kind == "hnsw":
+            return faiss.SearchParametersHNSW(sel=sel, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=sel)
+
+    def search_batch(self,
+                     vecs,
+                     k: int,
+                     allowed: list[np.ndarray | None] | None = None
+                     ) -> tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+        """
+        One FAISS search for many query vectors.  Returns (sims, pos, rows):
+        `pos` holds positions into `rows` (-1 where fewer than k hits).
+        `allowed[i]`, when not None, restricts query i to those row ids
+        (e.g. from near()); such queries are searched one by one: sets below
+        EXACT_BELOW (or that the ANN search under-fills) by exact cosine over
+        the stored vectors, larger ones through a faiss IDSelector.
+        """
+        sims, pos, cands = self._search(vecs, k, allowed)
+        return sims, pos, cands.rows
+
+    def _search(self, vecs, k: int, allowed=None) -> tuple[np.ndarray, np.ndarray, CandidateStore]:
+        """search_batch(), returning the CandidateStore that `pos` points into."""
+        with self._lock:
+            cands = self._cands
+            m = len(vecs)
+            if not self._ids:
+                return np.empty((m, 0), np.float32), np.empty((m, 0), np.int64), cands
+            q = _as_unit_matrix(vecs)
+            k = min(k, len(self._ids))
+            if allowed is None:
+                sims, fids = self._index.search(q, k)
+            else:
+                sims = np.full((m, k), -np.inf, dtype=np.float32)
+                fids = np.full((m, k), -1, dtype=np.int64)
+                free = np.array([a is None for a in allowed], dtype=bool)
+                if free.any():
+                    sims[free], fids[free] = self._index.search(q[free], k)
+                for i in np.flatnonzero(~free):
+                    ids = np.ascontiguousarray(allowed[i], dtype=np.int64)
+                    if not len(ids):
+                        continue
+                    kk = min(k, len(ids))
+                    exact = cands.vecs is not None and (len(ids) < EXACT_BELOW or self.kind == "flat")
+                    if not exact:
+                        # IVF probes / HNSW walks can miss ids of a sparse selection
+                        sel = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+                        s, f = self._index.search(q[i:i + 1], kk, params=self._search_params(sel))
+                        exact = cands.vecs is not None and (f[0] < 0).any()
+                    if exact:
+                        s, f = self._exact_search(cands, q[i], ids, kk)
+                    sims[i, :kk], fids[i, :kk] = s[0], f[0]
+        pos = cands.rows.index.get_indexer(fids.ravel()).reshape(fids.shape)
+        return sims, pos, cands
+
+    @staticmethod
+    def _exact_search(cands: CandidateStore, q: np.ndarray, ids: np.ndarray, k: int):
+        """Top-k of row ids `ids` by exact cosine to unit vector `q`, as (1, k) sims / ids."""
+        at = cands.rows.index.get_indexer(ids)
+        ids, at = ids[at >= 0], at[at >= 0]
+        s = cands.vecs[at].astype(np.float32, copy=False) @ q
+        top = np.argsort(-s, kind="stable")[:k]
+        sims = np.full((1, k), -np.inf, dtype=np.float32)
+        fids = np.full((1, k), -1, dtype=np.int64)
+        sims[0, :len(top)], fids[0, :len(top)] = s[top], ids[top]
+        return sims, fids
+
+    def search(self, vec: np.ndarray, k: int, allowed: np.ndarray | None = None) -> pd.DataFrame:
+        """Top-k rows by cosine similarity to `vec`, with a `sim` column."""
+        sims, pos, rows = self.search_batch([vec], k, None if allowed is None else [allowed])
+        found = pos[0] >= 0
+        subset = rows.iloc[pos[0][found]].copy()
+        subset["sim"] = sims[0][found]
+        return subset.reset_index(drop=True)
+
+    # -------------------------------------------------------------- #
+    @contextmanager
+    def _mutation(self):
+        """Hold the lock for a change; the outermost block saves once, if anything changed."""
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            if not self._depth and self._dirty:
+                self._dirty = False
+                if self.path is not None:
+                    self.save(self.path)
+
+    def _persist(self) -> None:
+        self._dirty = True                    # written when the outermost _mutation() ends
+
+    def save(self, path: str | Path) -> None:
+        """
+        faiss.write_index to `path`, rows and id maps alongside it.  Each
+        file is written under a temporary name and renamed over the old
+        one, meta.json last; load() rejects a mix of old and new files.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._index is not None:
+                _replace_file(path, lambda tmp: faiss.write_index(self._index, str(tmp)))
+            _replace_file(path.with_suffix(".rows.pkl"), self.rows.to_pickle)
+            if self._cands.vecs is not None:
+                _replace_file(path.with_suffix(".vecs.npy"), self._save_vecs)
+            _replace_file(path.with_suffix(".meta.json"), lambda tmp: tmp.write_text(json.dumps({
+                "id_col": self.id_col, "kind": self.kind,
+                "nlist": self.nlist, "nprobe": self.nprobe,
+                "hnsw_m": self.hnsw_m, "ef_search": self.ef_search,
+                "pq_m": self.pq_m, "trained_on": self._trained_on,
+                "next_id": self._next_id, "ids": self._ids,
+                "fingerprints": self._fingerprints,
+                "ntotal": self._index.ntotal if self._index is not None else 0,
+            })))
+
+    def _save_vecs(self, tmp: Path) -> None:
+        with open(tmp, "wb") as fh:               # np.save(path) would append ".npy"
+            np.save(fh, self._cands.vecs)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "JobIndex":
+        """Reopen a save(); ValueError if its files are not from the same save."""
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".meta.json").read_text())
+        index = cls(id_col=meta["id_col"], kind=meta["kind"],
+                    nlist=meta["nlist"], nprobe=meta["nprobe"],
+                    hnsw_m=meta["hnsw_m"], ef_search=meta["ef_search"],
+                    pq_m=meta.get("pq_m", PQ_M), path=path)
+        rows = pd.read_pickle(path.with_suffix(".rows.pkl"))
+        cands = CandidateStore.from_df(rows)          # files saved with a "vec" column
+        if cands.vecs is None and path.with_suffix(".vecs.npy").exists():
+            cands.vecs = np.load(path.with_suffix(".vecs.npy"))
+        index._cands = cands
+        index._ids = meta["ids"]
+        index._fingerprints = meta["fingerprints"]
+        index._next_id = meta["next_id"]
+        index._trained_on = meta.get("trained_on", len(rows))
+        if path.exists():
+            index._index = faiss.read_index(str(path))
+            index._apply_search_params(index._index)
+        ntotal = index._index.ntotal if index._index is not None else 0
+        if (set(rows.index) != set(index._ids.values())
+                or (cands.vecs is not None and len(cands.vecs) != len(rows))
+                or ntotal != meta.get("ntotal", ntotal)):
+            raise ValueError(f"{path}: index files are from different saves")
+        index._geo.add(rows.index, cands["lat"], cands["lon"])
+        index._avail.add(rows.index, cands.avail())
+        return index
+
+
+def _replace_file(path: Path, write) -> None:
+    """write(tmp) to a sibling temporary file, then rename it over `path` (atomic)."""
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def recall_at_k(index: JobIndex, query_vecs, k: int = 10) -> float:
+    """
+    Fraction of the exact (brute-force inner product) top-k that `index`
+    returns for `query_vecs`; 1.0 for kind="flat".
+    """
+    sims, pos, cands = index._search(query_vecs, k)
+    if not len(cands):
+        return 1.0
+    k = pos.shape[1]
+    exact = _as_unit_matrix(query_vecs) @ cands.vecs.astype(np.float32).T
+    truth = np.argpartition(-exact, k - 1, axis=1)[:, :k]
+    hits = sum(len(set(t) & set(p[p >= 0])) for t, p in zip(truth, pos))
+    return hits / truth.size
+
+
+def quantization_report(df: pd.DataFrame, query_vecs, k: int = 10, kinds=INDEX_KINDS) -> pd.DataFrame:
+    """
+    Per index kind over the encoded rows `df` (e.g. the job pool, with the
+    workers' vectors as queries): FAISS bytes per vector and recall@k
+    against the exact float32 ranking.
+    """
+    report = []
+    for kind in kinds:
+        index = JobIndex.from_df(df, id_col=None, kind=kind)
+        report.append({
+            "kind": kind,
+            "bytes_per_vec": faiss.serialize_index(index._index).nbytes / max(len(index), 1),
+            f"recall@{k}": recall_at_k(index, query_vecs, k),
+        })
+    return pd.DataFrame(report)
+
+
+class PartitionedIndex:
+    """
+    One JobIndex shard per normalized job_type (per job_type + province when
+    `by_province`), so a query only searches rows of its own partition.
+    Rows whose job_type / province is edited move to their new shard on sync.
+    """
+
+    def __init__(self,
+                 id_col: str | None = "job_id",
+                 by_province: bool = False,
+                 path: str | Path | None = None,
+                 **params):
+        self.id_col = id_col
+        self.by_province = by_province
+        self.path = Path(path) if path is not None else None
+        self._params = params
+        self._shards: dict[str, JobIndex] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._shards.values())
+
+    def partition_keys(self, df: pd.DataFrame) -> np.ndarray:
+        keys = _norm_str(df, "job_type")
+        if self.by_province:
+            keys = keys + "|" + _norm_str(df, "province")
+        return keys
+
+    def _shard(self, key: str) -> JobIndex:
+        if key not in self._shards:
+            path = None
+            if self.path is not None:
+                slug = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+                path = self.path / f"{slug}.faiss"
+            self._shards[key] = JobIndex(id_col=self.id_col, path=path, **self._params)
+            self._save_manifest()
+        return self._shards[key]
+
+    @contextmanager
+    def _mutation(self):
+        """Hold every existing shard's _mutation(): each one saves once, at the end."""
+        with self._lock, ExitStack() as stack:
+            for shard in list(self._shards.values()):
+                stack.enter_context(shard._mutation())
+            yield
+
+    def upsert(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        parts = self.partition_keys(df)
+        ids = df[self.id_col].astype(str).to_numpy() if self.id_col else None
+        with self._mutation():
+            for key in np.unique(parts):
+                mask = parts == key
+                if ids is not None:
+                    # an edited row may have moved partition: drop it elsewhere
+                    for other, shard in self._shards.items():
+                        if other != key:
+                            shard.remove(ids[mask])
+                self._shard(key).upsert(df[mask])
+
+    def remove(self, keys) -> None:
+        keys = list(keys)
+        with self._mutation():
+            for shard in self._shards.values():
+                shard.remove(keys)
+
+    def sync(self, df: pd.DataFrame) -> None:
+        """Mirror `df` shard by shard (see JobIndex.sync); empty shards are dropped."""
+        parts = self.partition_keys(df)
+        with self._mutation():
+            for key in set(self._shards) | set(parts.tolist()):
+                self._shard(key).sync(df[parts == key])
+            for key in [k for k, s in self._shards.items() if not len(s)]:
+                del self._shards[key]
+            self._save_manifest()
+
+    # -------------------------------------------------------------- #
+    def _save_manifest(self) -> None:
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        _replace_file(self.path / "partitions.json", lambda tmp: tmp.write_text(json.dumps({
+            "id_col": self.id_col, "by_province": self.by_province,
+            "params": self._params,
+            "shards": {k: s.path.name for k, s in self._shards.items()},
+        })))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PartitionedIndex":
+        path = Path(path)
+        manifest = json.loads((path / "partitions.json").read_text())
+        index = cls(id_col=manifest["id_col"], by_province=manifest["by_province"],
+                    path=path, **manifest["params"])
+        index._shards = {k: JobIndex.load(path / name) for k, name in manifest["shards"].items()}
+        return index
+
+
+def _row_fingerprints(df: pd.DataFrame) -> list[int]:
+    # hashed by value, not via astype(str): datetimes format differently
+    # depending on the frame they are in ("2026-10-01" vs "... 00:00:00")
+    cols = df.drop(columns="vec", errors="ignore")
+    return pd.util.hash_pandas_object(cols, index=False).tolist()
+
+
+_SHARED_INDEXES: dict[str, JobIndex | PartitionedIndex] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_index(name: str,
+                 id_col: str | None = "job_id",
+                 partitioned: bool = False,
+                 by_province: bool = False) -> JobIndex | PartitionedIndex:
+    """
+    Process-wide JobIndex (or PartitionedIndex when `partitioned`), shared by
+    every Streamlit session and persisted under INDEX_DIR so a restart
+    reopens it instead of re-indexing.
+    """
+    if partitioned:
+        return _shared_partitioned(name, id_col, by_province)
+    with _SHARED_LOCK:
+        if name not in _SHARED_INDEXES:
+            path = INDEX_DIR / f"{name}.faiss"
+            index = None
+            if path.with_suffix(".meta.json").exists():
+                index = _load_or_none(JobIndex, path)
+                if index is not None and (index.kind != INDEX_KIND or index.id_col != id_col):
+                    index = None
+            _SHARED_INDEXES[name] = index or JobIndex(id_col=id_col, kind=INDEX_KIND, path=path)
+        return _SHARED_INDEXES[name]
+
+
+def _shared_partitioned(name: str, id_col: str | None, by_province: bool) -> PartitionedIndex:
+    key = f"{name}/by_type" + ("_province" if by_province else "")
+    with _SHARED_LOCK:
+        if key not in _SHARED_INDEXES:
+            path = INDEX_DIR / key.replace("/", "_")
+            index = None
+            if (path / "partitions.json").exists():
+                index = _load_or_none(PartitionedIndex, path)
+                if index is not None and (index._params.get("kind") != INDEX_KIND or index.id_col != id_col):
+                    index = None
+            _SHARED_INDEXES[key] = index or PartitionedIndex(
+                id_col=id_col, by_province=by_province, path=path, kind=INDEX_KIND
+            )
+        return _SHARED_INDEXES[key]
+
+
+def _load_or_none(cls, path: Path):
+    """cls.load(path), or None (index rebuilt on the next sync) if the files are unusable."""
+    try:
+        return cls.load(path)
+    except Exception as e:                # torn save, old format, faiss read error, ...
+        log.warning("discarding index at %s: %s", path, e)
+        return None
 
 # ------------------------------------------------------------------ #
-# 6) Feature construction
+# 6) Feature construction (shared with train_matching_model.py)
 # ------------------------------------------------------------------ #
-def _feature_df(worker: pd.Series, jobs_subset: pd.DataFrame) -> tuple:
-    sim = jobs_subset["sim"].to_numpy().reshape(-1,1)
-    same_type = (jobs_subset["job_type"].str.strip().str.lower().to_numpy() == 
-                 str(worker.get("job_type","")).strip().lower()).astype(int).reshape(-1,1)
-    loc_vals = jobs_subset[["province","district","subdistrict"]].applymap(lambda x: str(x).strip().lower()).values
-    worker_loc = [str(worker.get(c,"")).strip().lower() for c in ["province","district","subdistrict"]]
-    loc_match = (loc_vals == worker_loc).all(axis=1).astype(int).reshape(-1,1)
+FEATURES = ["sim", "diff_wage", "same_type", "time_match", "loc_match", "dist_km"]
+
+_LOC_COLS = ["province", "district", "subdistrict"]
 
-    if "salary" in jobs_subset.columns:
-        job_pay = pd.to_numeric(jobs_subset["salary"], errors="coerce").to_numpy().reshape(-1,1)
-    else:
-        start = pd.to_numeric(jobs_subset.get("start_salary",0), errors="coerce")
-        rng   = pd.to_numeric(jobs_subset.get("range_salary",0), errors="coerce")
-        job_pay = ((start + rng)/2).to_numpy().reshape(-1,1)
-    worker_pay = float(worker.get("exp_wage",0))
-    diff_wage = np.abs(job_pay - worker_pay)
-
-    if {"start_dt","end_dt"}.issubset(jobs_subset.columns) and "avail_start" in worker.index:
-        overlap = np.minimum(jobs_subset["end_dt"], worker["avail_end"]) - \
-                  np.maximum(jobs_subset["start_dt"], worker["avail_start"])
-        time_match = (overlap.dt.total_seconds().fillna(0) > 0).astype(int).reshape(-1,1)
-    else:
-        time_match = np.zeros_like(sim)
 
-    return sim, diff_wage, same_type, time_match, loc_match
+def _norm_str(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    return df[col].fillna("").astype(str).str.strip().str.lower().to_numpy()
+
+
+def _norm_place(df: pd.DataFrame, col: str) -> np.ndarray:
+    """_norm_str without the "เขต" / "แขวง" / ... prefix, so old and new region names match."""
+    if col not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    s = df[col].fillna("").astype(str).str.replace(regions.PREFIX_RE, "", regex=True)
+    return s.str.strip().str.lower().to_numpy()
+
+
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def _pay(df: pd.DataFrame) -> np.ndarray:
+    """Posted `salary` for jobs; `exp_wage` or the start/range midpoint for workers."""
+    if "salary" in df.columns:
+        return _num(df, "salary")
+    if "exp_wage" in df.columns:
+        return _num(df, "exp_wage")
+    start, rng = _num(df, "start_salary"), _num(df, "range_salary")
+    return np.where(rng > 0, (start + rng) / 2, start)
+
+
+def _latlon(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    if not {"lat", "lon"}.issubset(df.columns):
+        df = _attach_latlon(df.copy())
+    if not {"lat", "lon"}.issubset(df.columns):
+        return np.full(len(df), np.nan), np.full(len(df), np.nan)
+    return _num(df, "lat"), _num(df, "lon")
+
+
+def _feature_arrays(queries: pd.DataFrame | CandidateStore,
+                    cands: pd.DataFrame | CandidateStore,
+                    pos: np.ndarray,
+                    sims: np.ndarray,
+                    qpos: np.ndarray | None = None) -> tuple:
+    """
+    The FEATURES for every (query, candidate) pair as 2-D arrays of shape
+    pos.shape; pos[i, j] is a row position in `cands`.  Row i belongs to
+    query i, or to query qpos[i] when `qpos` is given.  Encoded frames
+    are turned into CandidateStores first.
+    """
+    q, c = _as_store(queries), _as_store(cands)
+    pad = pos < 0                                  # filler slots of short result lists
+    pos = np.where(pad, 0, pos)
+    sim = np.asarray(sims, dtype=float)
+
+    def _q(arr):
+        arr = arr if qpos is None else arr[qpos]
+        return arr[:, None]
+
+    same_type = (c["type"][pos] == _q(q["type"])).astype(int)
+    loc_match = (c["loc"][pos] == _q(q["loc"])).astype(int)
+
+    diff_wage = np.abs(c["pay"][pos] - _q(q["pay"]))
+    diff_wage[pad] = np.nan                        # keep padding out of per-query wage scaling
+
+    dist_km = _haversine_km(_q(q["lat"]), _q(q["lon"]), c["lat"][pos], c["lon"][pos])   # NaN if unknown
+
+    # 0 where either side has no dates
+    time_match = _schedules_overlap([_q(a) for a in q.avail()], [a[pos] for a in c.avail()]).astype(int)
+
+    return sim, diff_wage, same_type, time_match, loc_match, dist_km
+
+
+def pair_features(workers: pd.DataFrame | CandidateStore,
+                  jobs: pd.DataFrame | CandidateStore,
+                  worker_pos: np.ndarray,
+                  job_pos: np.ndarray) -> np.ndarray:
+    """
+    (N, len(FEATURES)) float32 FEATURES for explicit (workers[worker_pos[i]], jobs[job_pos[i]])
+    pairs, e.g. a match history; both frames come from encode_*_df.  Pass
+    CandidateStore.from_df(..., dtype=np.float32) of them instead when
+    calling repeatedly over the same tables (e.g. per history chunk).
+    """
+    workers, jobs = (
+        CandidateStore.from_df(d, dtype=np.float32) if isinstance(d, pd.DataFrame) else d
+        for d in (workers, jobs)
+    )
+    sim = np.einsum("ij,ij->i",
+                    workers.vecs[worker_pos].astype(np.float32, copy=False),
+                    jobs.vecs[job_pos].astype(np.float32, copy=False))
+    feats = _feature_arrays(workers, jobs, job_pos[:, None], sim[:, None], qpos=worker_pos)
+    return np.column_stack([f.ravel() for f in feats]).astype(np.float32)
 
 # ------------------------------------------------------------------ #
-# 7) Recommend function
+# 7) Scoring: LightGBM ranker (matching.lgb) or hand-tuned blend
 # ------------------------------------------------------------------ #
+RANKER_PATH = Path(__file__).parent / "matching.lgb"
+SCORER = os.environ.get("FASTLABOR_SCORER", "linear")   # "linear" | "lgb"
+
+_RANKER = None
+_RANKER_LOADED = False
+_RANKER_LOCK = threading.Lock()
+
+
+def _get_ranker():
+    """Booster from RANKER_PATH, loaded once; None if lightgbm or the file is missing."""
+    global _RANKER, _RANKER_LOADED
+    with _RANKER_LOCK:
+        if not _RANKER_LOADED:
+            _RANKER_LOADED = True
+            try:
+                import lightgbm as lgb
+            except ImportError:
+                return None
+            if RANKER_PATH.exists():
+                _RANKER = lgb.Booster(model_file=str(RANKER_PATH))
+        return _RANKER
+
+
+def _lgb_score(booster, feats) -> np.ndarray:
+    # a model trained before a feature was appended to FEATURES uses the leading columns
+    feats = feats[:booster.num_feature()]
+    shape = feats[0].shape
+    X = np.empty((feats[0].size, len(feats)), dtype=np.float32)
+    for j, f in enumerate(feats):
+        X[:, j] = f.ravel()
+    return booster.predict(X).reshape(shape)
+
+
+def _score(feats, scorer: str | None = None) -> np.ndarray:
+    if (scorer or SCORER) == "lgb":
+        booster = _get_ranker()
+        if booster is not None:
+            return _lgb_score(booster, feats)
+    return _linear_score(*feats)
+
+
+W_TYPE = 0.8
+W_LOC  = 0.1
+W_WAGE = 0.05
+W_TIME = 0.05
+GEO_SCALE_KM = 20.0     # proximity score falls to 1/e at this distance
+
+
+def _linear_score(sim, diff_wage, same_type, time_match, loc_match, dist_km) -> np.ndarray:
+    """
+    Hand-tuned blend; each argument is (n_queries, k), wage scaled per query.
+    Location scores by distance, falling back to the exact-match flag when
+    either side has no coordinates.
+    """
+    max_diff = np.nanmax(diff_wage, axis=1, initial=0.0, keepdims=True)
+    max_diff[max_diff <= 0] = 1.0
+    wage_score = np.nan_to_num(1 - diff_wage / max_diff)
+    loc_score = np.where(np.isnan(dist_km), loc_match, np.exp(-np.nan_to_num(dist_km) / GEO_SCALE_KM))
+    return (
+        W_TYPE * same_type +
+        W_LOC  * loc_score +
+        W_WAGE * wage_score +
+        W_TIME * time_match
+    )
+
+# ------------------------------------------------------------------ #
+# 8) Recommend function
+# ------------------------------------------------------------------ #
+def _top_n(scores: np.ndarray, n: int, keys: np.ndarray | None = None) -> np.ndarray:
+    """
+    Column positions of the n best scores per row, best first (ties keep
+    candidate order).  With `keys` (same shape) only the best candidate
+    per key value in each row is eligible; slots that cannot be filled
+    point at -inf scores.  Works in place on `scores`.
+    """
+    m, k = scores.shape
+    n = max(0, min(n, k))
+    if not n:
+        return np.empty((m, 0), dtype=np.intp)
+    if keys is not None:
+        codes = pd.factorize(keys.ravel(), use_na_sentinel=False)[0]   # missing keys: one value
+        group = np.repeat(np.arange(m), k) * (codes.max() + 1) + codes
+        order = np.lexsort((-scores.ravel(), group))          # by group, best first
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = group[order[1:]] != group[order[:-1]]
+        dup = np.zeros(order.size, dtype=bool)
+        dup[order[~first]] = True                             # a better row has the same key
+        scores[dup.reshape(m, k)] = -np.inf
+    if n < k:
+        # n-th best per row via argpartition; ties at that score go by position
+        kth = np.take_along_axis(scores, np.argpartition(-scores, n - 1, axis=1)[:, n - 1:n], axis=1)
+        tie = scores == kth
+        room = n - (scores > kth).sum(axis=1, keepdims=True)
+        sel = (scores > kth) | (tie & (np.cumsum(tie, axis=1) <= room))
+        part = np.nonzero(sel)[1].reshape(m, n)
+    else:
+        part = np.broadcast_to(np.arange(k), (m, k))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _allowed(index: JobIndex,
+             queries: pd.DataFrame,
+             radius_km: float | None,
+             time_filter: bool = TIME_FILTER):
+    """
+    Per-query row ids passing the prefilters: schedule overlap (when
+    `time_filter`) and distance (when `radius_km`).  A query without dates
+    or coordinates is not filtered on them; None means no filter at all.
+    """
+    use_geo = bool(radius_km) and len(index._geo) > 0
+    avail = _availability(queries) if time_filter and len(index._avail) else None
+    if not use_geo and avail is None:
+        return None
+    lat, lon = _latlon(queries) if use_geo else (None, None)
+    out = []
+    for i in range(len(queries)):
+        ids = None
+        if avail is not None and not (np.isnan(avail[0][i]) or np.isnan(avail[1][i])):
+            ids = index.available(*(a[i] for a in avail))     # most selective: run first
+        if use_geo and not (np.isnan(lat[i]) or np.isnan(lon[i])):
+            near = index.near(lat[i], lon[i], radius_km)
+            ids = near if ids is None else np.intersect1d(ids, near, assume_unique=True)
+        out.append(ids)
+    return out if any(ids is not None for ids in out) else None
+
+
 def recommend(worker_row: pd.Series,
-              jobs_df: pd.DataFrame,
+              jobs_df: pd.DataFrame | None = None,
               k: int = 50,
-              n: int = 5) -> pd.DataFrame:
-    mat = np.vstack(jobs_df["vec"])
-    index = _build_faiss_index(mat)
-    w_vec = worker_row["vec"].reshape(1, -1)
-    faiss.normalize_L2(w_vec)
-    sim_scores, idxs = index.search(w_vec, k)
-    sim_arr, idxs = sim_scores[0], idxs[0]
-
-    subset = jobs_df.iloc[idxs].copy().reset_index(drop=True)
-    subset["sim"] = sim_arr
-
-    sim_arr, diff_arr, type_arr, time_arr, loc_arr = _feature_df(worker_row, subset)
-    max_diff = diff_arr.max() if diff_arr.max() > 0 else 1.0
-    wage_score = 1 - (diff_arr / max_diff)
-
-    w_type  = 0.8
-    w_loc   = 0.1
-    w_wage  = 0.05
-    w_time  = 0.05
-
-    final = (
-        w_type * type_arr.reshape(-1) +
-        w_loc  * loc_arr.reshape(-1) +
-        w_wage * wage_score.reshape(-1) +
-        w_time * time_arr.reshape(-1)
-    )
+              n: int = 5,
+              index: JobIndex | PartitionedIndex | None = None,
+              scorer: str | None = None,
+              radius_km: float | None = GEO_RADIUS_KM,
+              time_filter: bool = TIME_FILTER,
+              dedupe_on: str | None = None) -> pd.DataFrame:
+    """
+    Top-n jobs for one worker.  With `time_filter` only jobs whose schedule
+    overlaps the worker's are searched, with `radius_km` only jobs within
+    that distance (workers without dates / coordinates are not filtered).
+    With `dedupe_on` (e.g. "email") at most one row per value is returned.
+    """
+    with timing.profiled("recommend"), timing.stage("recommend", rows=1) as st:
+        out = recommend_batch(worker_row.to_frame().T, jobs_df, k=k, n=n, index=index, scorer=scorer,
+                              radius_km=radius_km, time_filter=time_filter, dedupe_on=dedupe_on)
+        st["candidates"] = len(out)
+        return out.drop(columns=["worker_index", "rank"])
+
+# ------------------------------------------------------------------ #
+# 9) Batch recommend: many workers, one FAISS search
+# ------------------------------------------------------------------ #
+def recommend_batch(workers_df: pd.DataFrame,
+                    jobs_df: pd.DataFrame | None = None,
+                    k: int = 50,
+                    n: int = 5,
+                    index: JobIndex | PartitionedIndex | None = None,
+                    scorer: str | None = None,
+                    radius_km: float | None = GEO_RADIUS_KM,
+                    time_filter: bool = TIME_FILTER,
+                    dedupe_on: str | None = None) -> pd.DataFrame:
+    """
+    Rank every row of `workers_df` against all jobs at once.  Returns a long
+    frame with up to n rows per worker: the job columns plus `worker_index`
+    (label in workers_df), `rank` (1-based), `sim` and `ai_score`.
+    `scorer` is "lgb" or "linear"; defaults to SCORER.  With a
+    PartitionedIndex each worker only searches its own partition; with
+    `time_filter` only jobs overlapping its schedule, with `radius_km` only
+    jobs within that distance.  With `dedupe_on` each worker gets at most
+    one row per value of that job column, chosen among the k candidates
+    before any rows are materialized.
+    """
+    with timing.profiled("recommend_batch"), timing.stage("recommend_batch", rows=len(workers_df)) as st:
+        if index is None:
+            with timing.stage("index_build", rows=len(jobs_df)):
+                index = JobIndex.from_df(jobs_df, id_col=None)
+        if not isinstance(index, PartitionedIndex):
+            out = _rank_batch(workers_df, index, k, n, scorer, radius_km, time_filter, dedupe_on)
+        else:
+            parts = index.partition_keys(workers_df)
+            frames = [
+                _rank_batch(workers_df[parts == key], shard, k, n, scorer, radius_km, time_filter, dedupe_on)
+                for key, shard in list(index._shards.items()) if (parts == key).any()
+            ]
+            if not frames:
+                out = pd.DataFrame(columns=["worker_index", "rank", "sim", "ai_score"])
+            else:
+                # empty shard results still carry the row columns
+                out = pd.concat([f for f in frames if not f.empty] or frames[:1], ignore_index=True)
+                if workers_df.index.is_unique:            # back to workers_df order
+                    at = workers_df.index.get_indexer(out["worker_index"])
+                    out = out.iloc[np.argsort(at, kind="stable")].reset_index(drop=True)
+        st["candidates"] = len(out)
+        return out
+
+
+def _rank_batch(workers_df: pd.DataFrame,
+                index: JobIndex,
+                k: int,
+                n: int,
+                scorer: str | None,
+                radius_km: float | None,
+                time_filter: bool,
+                dedupe_on: str | None) -> pd.DataFrame:
+    if workers_df.empty or len(index) == 0:
+        return index.rows.iloc[:0].assign(
+            worker_index=pd.Series(dtype=object), rank=pd.Series(dtype=int),
+            sim=pd.Series(dtype=float), ai_score=pd.Series(dtype=float),
+        ).reset_index(drop=True)
+
+    with timing.stage("prefilter", rows=len(workers_df)) as st:
+        allowed = _allowed(index, workers_df, radius_km, time_filter)
+        st["candidates"] = len(index) * len(workers_df) if allowed is None else \
+            sum(len(index) if ids is None else len(ids) for ids in allowed)
+    with timing.stage("search", rows=len(workers_df)) as st:
+        sims, pos, cands = index._search(workers_df["vec"], k, allowed)
+        st["candidates"] = int((pos >= 0).sum())
+    rows = cands.rows
+    with timing.stage("features", rows=len(workers_df)):
+        feats = _feature_arrays(workers_df, cands, pos, sims)
+    with timing.stage("score", rows=len(workers_df)):
+        scores = _score(feats, scorer)
+        scores[pos < 0] = -np.inf
+
+    with timing.stage("topn", rows=len(workers_df)):
+        keys = rows[dedupe_on].to_numpy()[np.where(pos >= 0, pos, 0)] if dedupe_on else None
+        order = _top_n(scores, n, keys)
+        top_pos = np.take_along_axis(pos, order, axis=1)
+        keep = (np.take_along_axis(scores, order, axis=1) > -np.inf).ravel()
 
-    subset["ai_score"] = final
-    return subset.sort_values("ai_score", ascending=False).head(n).reset_index(drop=True)
+    with timing.stage("materialize", rows=len(workers_df)) as st:
+        out = rows.iloc[top_pos.ravel()[keep]].reset_index(drop=True)
+        out.insert(0, "worker_index", np.repeat(workers_df.index.to_numpy(), order.shape[1])[keep])
+        out.insert(1, "rank", np.tile(np.arange(1, order.shape[1] + 1), len(workers_df))[keep])
+        out["sim"] = np.take_along_axis(sims, order, axis=1).ravel()[keep]
+        out["ai_score"] = np.take_along_axis(scores, order, axis=1).ravel()[keep]
+        st["candidates"] = len(out)
+    return out
 
 # ------------------------------------------------------------------ #
-# 8) Recommend seekers for employer (strict filter)
+# 10) Recommend seekers for employer (strict filter)
 # ------------------------------------------------------------------ #
 def recommend_seekers(job_row: pd.Series,
-                      workers_df: pd.DataFrame,
+                      workers_df: pd.DataFrame | None = None,
                       k: int = 50,
-                      n: int = 5) -> pd.DataFrame:
-    jt = str(job_row.get("job_type","")).strip().lower()
-    candidates = workers_df[workers_df["job_type"].str.strip().str.lower() == jt]
-    if candidates.empty:
-        return pd.DataFrame(columns=workers_df.columns.tolist() + ["ai_score"])
-    return recommend(worker_row=job_row, jobs_df=candidates, k=k, n=n)
+                      n: int = 5,
+                      scorer: str | None = None,
+                      index: PartitionedIndex | None = None,
+                      radius_km: float | None = GEO_RADIUS_KM,
+                      time_filter: bool = TIME_FILTER,
+                      dedupe_on: str | None = None) -> pd.DataFrame:
+    """
+    Top-n workers with the same job_type as `job_row`.  Pass a PartitionedIndex
+    over the workers to search only that job_type's shard; otherwise the
+    matching workers are filtered out of `workers_df` and indexed per call.
+    """
+    with timing.profiled("recommend_seekers"), timing.stage("recommend_seekers", rows=1):
+        if index is not None:
+            return recommend(worker_row=job_row, k=k, n=n, index=index, scorer=scorer,
+                             radius_km=radius_km, time_filter=time_filter, dedupe_on=dedupe_on)
+        with timing.stage("type_filter", rows=len(workers_df)) as st:
+            jt = str(job_row.get("job_type","")).strip().lower()
+            candidates = workers_df[workers_df["job_type"].str.strip().str.lower() == jt]
+            st["candidates"] = len(candidates)
+        if candidates.empty:
+            return pd.DataFrame(columns=workers_df.columns.tolist() + ["ai_score"])
+        return recommend(worker_row=job_row, jobs_df=candidates, k=k, n=n, scorer=scorer,
+                         radius_km=radius_km, time_filter=time_filter, dedupe_on=dedupe_on)
@@ -1,8 +1,6 @@
 import streamlit as st
 import pandas as pd
-import json
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+from storage import SCHEMA, get_repo
 
 # 1) Page config & guard
 st.set_page_config(page_title="Result Matching | FAST LABOR", layout="centered")
@@ -19,46 +17,21 @@ if selected_job_id is None and active_seeker_idx is None:
     st.stop()
 
 # -----------------------------------------------------------------
-# Helper: load any sheet into DataFrame
+# Helper: load any table into DataFrame (storage.py)
 # -----------------------------------------------------------------
-def _sheet_df(name: str) -> pd.DataFrame:
-    SCOPE = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        json.loads(st.secrets["gcp"]["credentials"]), SCOPE
-    )
-    gc = gspread.authorize(creds)
-    ws = gc.open("fastlabor").worksheet(name)
-    vals = ws.get_all_values()
-    df   = pd.DataFrame(vals[1:], columns=vals[0])
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
-    return df
+repo = get_repo()
 
-# -----------------------------------------------------------------
-# Helper: prepare match_results sheet
-# -----------------------------------------------------------------
-def _get_match_ws():
-    SCOPE = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        json.loads(st.secrets["gcp"]["credentials"]), SCOPE
-    )
-    gc = gspread.authorize(creds)
-    ws = gc.open("fastlabor").worksheet("match_results")
-    headers = ws.row_values(1)
-    return ws, [h.lower().strip() for h in headers]
+def _sheet_df(name: str) -> pd.DataFrame:
+    return repo.all(name)
 
 # -----------------------------------------------------------------
-# Load & encode data
+# Load data; rankings are precomputed in the background (recommendations.py)
 # -----------------------------------------------------------------
-from matching import encode_job_df, encode_worker_df, recommend_seekers, recommend
+from recommendations import materializer
 
-jobs_df    = encode_job_df(_sheet_df("post_job"))
-seekers_df = encode_worker_df(_sheet_df("find_job"))
+recs     = materializer()
+raw_seek = _sheet_df("find_job")
+raw_jobs = _sheet_df("post_job")
 
 # -----------------------------------------------------------------
 # Utility: compute avg salary
@@ -78,30 +51,19 @@ def avg_salary(row: pd.Series) -> str:
 # -----------------------------------------------------------------
 if selected_job_id is not None:
     # locate the selected job
-    job_rows = jobs_df[jobs_df["job_id"] == selected_job_id]
-    if job_rows.empty:
+    if raw_jobs[raw_jobs["job_id"] == selected_job_id].empty:
         st.error(f"ไม่พบงานที่มี Job ID = {selected_job_id}")
         st.stop()
-    job_row_encoded = job_rows.iloc[0]
-
-    # get many then filter unique to 5
-    original = recommend_seekers(job_row_encoded, seekers_df, k=50, n=50)
-    unique, seen = [], set()
-    for rec in original.itertuples(index=False):
-        if rec.email not in seen:
-            unique.append(rec)
-            seen.add(rec.email)
-        if len(unique) == 5:
-            break
-    top5 = pd.DataFrame(unique)
-
-    raw_seek = _sheet_df("find_job")
-    raw_jobs = _sheet_df("post_job")
+
+    # top-5 seekers (one per email), materialized
+    top5 = recs.top("post_job", selected_job_id)
+    if top5.empty and recs.warming_up:
+        st.info("⏳ กำลังคำนวณผลการจับคู่ กรุณารีเฟรชหน้านี้อีกครั้งในอีกสักครู่")
     priorities = {}
 
     for rank, rec in enumerate(top5.itertuples(index=False), start=1):
         st.divider()
-        seeker = raw_seek[raw_seek.email == rec.email].iloc[0]
+        seeker = raw_seek[raw_seek.findjob_id == rec.target_id].iloc[0]
         name   = f"{seeker.first_name} {seeker.last_name}".strip() or "-"
         gender = seeker.gender or "-"
         date   = seeker.job_date or "-"
@@ -126,10 +88,9 @@ if selected_job_id is not None:
             )
 
     if st.button("✅ Confirm Matches", use_container_width=True):
-        ws, headers = _get_match_ws()
         match_data = []
         for rank, rec in enumerate(top5.itertuples(index=False), start=1):
-            seeker   = raw_seek[raw_seek.email == rec.email].iloc[0].to_dict()
+            seeker   = raw_seek[raw_seek.findjob_id == rec.target_id].iloc[0].to_dict()
             job      = raw_jobs[raw_jobs.job_id == selected_job_id].iloc[0]
             job_sal  = job.get("salary", "")
             row = seeker.copy()
@@ -137,21 +98,14 @@ if selected_job_id is not None:
             row["job_id"]       = selected_job_id
             row["priority"]     = priorities.get(rank,1)
             row["status"]       = "on queue"
-            row["find_job_id"]  = rec.find_job_id if "find_job_id" in rec._fields else ""
             row["job_salary"]   = job_sal
             row["ai_score"]     = rec.ai_score
             match_data.append(row)
 
         if match_data:
-            df_up = pd.DataFrame(match_data)
-            cols  = [c.lower().strip() for c in df_up.columns]
-            exist = [c for c in cols if c in headers]
-            df_up = df_up[df_up.columns[df_up.columns.str.lower().str.strip().isin(exist)]]
-            df_up = df_up[sorted(df_up.columns, key=lambda c: headers.index(c.lower().strip()))]
-            start_row = len(ws.get_all_values()) + 1
-            data = df_up.values.tolist()
-            end_col = chr(ord("A") + df_up.shape[1] - 1)
-            ws.update(f"A{start_row}:{end_col}{start_row+len(data)-1}", data)
+            repo.insert_many("match_results", [
+                {c: r[c] for c in SCHEMA["match_results"] if c in r} for r in match_data
+            ])
             st.success("🎉 บันทึกผลการจับคู่เรียบร้อยแล้ว!")
         else:
             st.info("ไม่มีรายการจับคู่ที่จะบันทึก")
@@ -160,23 +114,16 @@ if selected_job_id is not None:
 # 5) Worker view: show Top-5 jobs
 # -----------------------------------------------------------------
 elif active_seeker_idx is not None:
-    seeker_row = seekers_df.iloc[active_seeker_idx]
-    original = recommend(seeker_row, jobs_df, k=50, n=50)
-    unique, seen = [], set()
-    for rec in original.itertuples(index=False):
-        if rec.job_id not in seen:
-            unique.append(rec)
-            seen.add(rec.job_id)
-        if len(unique) == 5:
-            break
-    top5 = pd.DataFrame(unique)
-
-    raw_jobs = _sheet_df("post_job")
+    findjob_id = raw_seek.iloc[active_seeker_idx]["findjob_id"]
+    top5 = recs.top("find_job", findjob_id)
+
     st.subheader("📋 งานที่ AI แนะนำสำหรับคุณ")
+    if top5.empty and recs.warming_up:
+        st.info("⏳ กำลังคำนวณผลการจับคู่ กรุณารีเฟรชหน้านี้อีกครั้งในอีกสักครู่")
 
     for rank, rec in enumerate(top5.itertuples(index=False), start=1):
         st.divider()
-        job  = raw_jobs[raw_jobs.job_id == rec.job_id].iloc[0]
+        job  = raw_jobs[raw_jobs.job_id == rec.target_id].iloc[0]
         date = job.job_date or "-"
         time = f"{job.start_time} – {job.end_time}"
         loc  = f"{job.province}/{job.district}/{job.subdistrict}"
@@ -2,26 +2,9 @@ import streamlit as st
 # Must be first
 st.set_page_config(page_title="Find Job", page_icon="🔍", layout="centered")
 
-import gspread
-import json
-import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
-
-# Load Thai location data
-@st.cache_data
-def load_location_data():
-    provinces = pd.read_json(
-        "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_province.json"
-    )
-    districts = pd.read_json(
-        "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_amphure.json"
-    )
-    subdistricts = pd.read_json(
-        "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_tambon.json"
-    )
-    return provinces, districts, subdistricts
-
-provinces, districts, subdistricts = load_location_data()
+import regions      # Thai location data, vendored and loaded once per process
+from storage import get_repo
+from recommendations import materializer
 
 # Initialize session_state defaults
 for key, default in {
@@ -34,29 +17,11 @@ for key, default in {
     if key not in st.session_state:
         st.session_state[key] = default
 
-# Configure Google Sheets
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# Connect to storage (storage.py)
 try:
-    if "gcp" in st.secrets:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(
-            json.loads(st.secrets.gcp.credentials), scope
-        )
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-    client = gspread.authorize(creds)
-    spreadsheet = client.open("fastlabor")
-    try:
-        sheet = spreadsheet.worksheet("find_job")
-    except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(title="find_job", rows="1000", cols="15")
-        headers = [
-            "findjob_id","first_name","last_name","email","job_type","skills",
-            "job_date","start_time","end_time","job_address",
-            "province","district","subdistrict","zip_code","start_salary","range_salary"
-        ]
-        sheet.append_row(headers)
+    repo = get_repo()
 except Exception as e:
-    st.error(f"❌ Cannot connect to Google Sheets: {e}")
+    st.error(f"❌ Cannot connect to storage: {e}")
     st.stop()
 
 # Ensure user is logged in
@@ -92,7 +57,7 @@ st.session_state.job_address = st.text_area(
 
 # Location cascade
 st.markdown("### Location Details")
-province_list = ["Select Province"] + provinces["name_th"].tolist()
+province_list = ["Select Province"] + regions.provinces()
 province = st.selectbox(
     "Province *", province_list,
     index=province_list.index(st.session_state.province)
@@ -105,8 +70,7 @@ if province != st.session_state.province:
 
 district_list = ["Select District"]
 if st.session_state.province != "Select Province":
-    pid = provinces.loc[provinces.name_th == st.session_state.province, "id"].iloc[0]
-    district_list += districts.loc[districts.province_id == pid, "name_th"].tolist()
+    district_list += regions.districts(st.session_state.province)
 district = st.selectbox(
     "District *", district_list,
     index=district_list.index(st.session_state.district) if st.session_state.district in district_list else 0
@@ -119,10 +83,8 @@ if district != st.session_state.district:
 sub_list = ["Select Subdistrict"]
 zip_map = {}
 if st.session_state.district != "Select District":
-    did = districts.loc[districts.name_th == st.session_state.district, "id"].iloc[0]
-    subs = subdistricts[subdistricts.amphure_id == did]
-    sub_list += subs["name_th"].tolist()
-    zip_map = subs.set_index("name_th")["zip_code"].to_dict()
+    zip_map = regions.zip_codes(st.session_state.province, st.session_state.district)
+    sub_list += list(zip_map)
 subdistrict = st.selectbox(
     "Subdistrict *", sub_list,
     index=sub_list.index(st.session_state.subdistrict) if st.session_state.subdistrict in sub_list else 0
@@ -136,26 +98,25 @@ st.text_input("Zip Code *", st.session_state.zip_code, disabled=True)
 # Submit button at the bottom
 if st.button("Find Job"):
     try:
-        profile_ws = spreadsheet.sheet1
-        records = profile_ws.get_all_records()
-        first_name = last_name = gender =""
-        for r in records:
-            if r.get("email") == auth_email:
-                first_name = r.get("first_name", "")
-                last_name = r.get("last_name", "")
-                gender = r.get("gender", "")
-                break
-        existing = sheet.get_all_values()
-        findjob_id = f"FJ{len(existing)}"
+        user = repo.first("users", email=auth_email) or {}
+        findjob_id = f"FJ{repo.count('find_job') + 1}"
         job_date = f"{start_date} to {end_date}"
-        sheet.append_row([\
-            findjob_id, first_name, last_name, auth_email,\
-            job_type, skills, job_date,\
-            str(start_time), str(end_time), st.session_state.job_address,\
-            st.session_state.province, st.session_state.district,\
-            st.session_state.subdistrict, st.session_state.zip_code,\
-            start_salary, range_salary, gender\
-        ])
+        repo.insert("find_job", {
+            "findjob_id": findjob_id,
+            "first_name": user.get("first_name", ""),
+            "last_name": user.get("last_name", ""),
+            "email": auth_email,
+            "job_type": job_type, "skills": skills, "job_date": job_date,
+            "start_time": str(start_time), "end_time": str(end_time),
+            "job_address": st.session_state.job_address,
+            "province": st.session_state.province,
+            "district": st.session_state.district,
+            "subdistrict": st.session_state.subdistrict,
+            "zip_code": st.session_state.zip_code,
+            "start_salary": start_salary, "range_salary": range_salary,
+            "gender": user.get("gender", ""),
+        })
+        materializer().notify("find_job", findjob_id)
         st.success(f"✅ Job search saved with ID: {findjob_id}")
     except Exception as e:
         st.error(f"❌ Error: {e}")
@@ -1,8 +1,5 @@
 import streamlit as st
-import pandas as pd
-import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from storage import get_repo
 
 # ------------------------------------------------------------------
 # 1) Page config & ensure login
@@ -18,40 +15,20 @@ st.title("🔍 รายการจับคู่ของฉัน")
 # ------------------------------------------------------------------
 # 2) Helpers
 # ------------------------------------------------------------------
-def _sheet_df(sheet_name: str) -> pd.DataFrame:
-    """Load a sheet into a DataFrame with normalized column names."""
-    SCOPE = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(st.secrets["gcp"]["credentials"]), SCOPE)
-    gc = gspread.authorize(creds)
-    ws = gc.open("fastlabor").worksheet(sheet_name)
-    all_values = ws.get_all_values()
-    if not all_values:
-        return pd.DataFrame()
-    df = pd.DataFrame(all_values[1:], columns=all_values[0])
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
-    return df
+repo = get_repo()
 
-def _update_status(findjob_id: str, new_status: str):
-    """Update the 'status' column in match_results for a given findjob_id."""
+def _update_status(findjob_id: str, job_id: str, new_status: str):
+    """Update the 'status' of the match_results row for (findjob_id, job_id)."""
     if new_status not in ("Accepted", "Declined"):
         st.error("❌ สถานะต้องเป็น Accepted หรือ Declined")
         return False
-    SCOPE = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(st.secrets["gcp"]["credentials"]), SCOPE)
-    gc = gspread.authorize(creds)
-    ws = gc.open("fastlabor").worksheet("match_results")
-
-    df = _sheet_df("match_results")
-    try:
-        row_ix = df.index[df["findjob_id"] == findjob_id][0] + 2
-        col_ix = list(df.columns).index("status") + 1
-    except (IndexError, ValueError):
-        st.error(f"❌ ไม่สามารถอัปเดตสถานะ findjob_id={findjob_id}")
-        return False
-
-    cell = f"{chr(ord('A') + col_ix - 1)}{row_ix}"
+    where = {"findjob_id": findjob_id}
+    if job_id:
+        where["job_id"] = job_id
     try:
-        ws.update_acell(cell, new_status)
+        if not repo.update("match_results", where, {"status": new_status}):
+            st.error(f"❌ ไม่สามารถอัปเดตสถานะ findjob_id={findjob_id}")
+            return False
         st.success(f"✅ อัปเดต findjob_id={findjob_id} → {new_status}")
         return True
     except Exception as e:
@@ -61,13 +38,8 @@ def _update_status(findjob_id: str, new_status: str):
 # ------------------------------------------------------------------
 # 3) Load & dedupe match_results for this user
 # ------------------------------------------------------------------
-match_df = _sheet_df("match_results")
-if match_df.empty:
-    st.info("📄 ไม่มีข้อมูล match_results")
-    st.stop()
-
 my_df = (
-    match_df[match_df["email"] == user_email]
+    repo.find("match_results", email=user_email)
     .drop_duplicates(subset="findjob_id", keep="first")
     .reset_index(drop=True)
 )
@@ -90,10 +62,10 @@ for _, row in my_df.iterrows():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Decline", key=f"decline_{fid}"):
-            _update_status(fid, "Declined")
+            _update_status(fid, row.get("job_id", ""), "Declined")
     with col2:
         if st.button("Accept", key=f"accept_{fid}"):
-            success = _update_status(fid, "Accepted")
+            success = _update_status(fid, row.get("job_id", ""), "Accepted")
             if success:
                 # ส่งข้อมูล row ทั้งหมดไปหน้า job_detail
                 st.session_state["selected_job"] = row.to_dict()
@@ -1,9 +1,6 @@
 import streamlit as st
 from datetime import datetime, date, time
-import pandas as pd
-import gspread
-import json
-from oauth2client.service_account import ServiceAccountCredentials
+from storage import get_repo
 
 # 1) Page Config
 st.set_page_config(layout="centered")
@@ -23,20 +20,8 @@ st.markdown("""
 st.markdown("## Job Detail")
 st.image("image.png", width=150)
 
-# 2) Connect to Google Sheets
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(
-    json.loads(st.secrets["gcp"]["credentials"]), scope
-)
-gc = gspread.authorize(creds)
-sh = gc.open("fastlabor")
-
-# 3) Load sheets
-ws_match = sh.worksheet("match_results")
-match_results_df = pd.DataFrame(ws_match.get_all_records())
-
-ws_post = sh.worksheet("post_job")
-post_df = pd.DataFrame(ws_post.get_all_records())
+# 2-3) Repository (storage.py)
+repo = get_repo()
 
 # 4) Get selected match
 selected = st.session_state.get("selected_job")
@@ -46,9 +31,8 @@ if not selected:
 
 # 5) Find employer
 job_id = selected.get("job_id")
-emp_row = post_df[post_df["job_id"] == job_id]
-if not emp_row.empty:
-    emp = emp_row.iloc[0]
+emp = repo.first("post_job", job_id=job_id) if job_id else None
+if emp is not None:
     employer_name = f"{emp.get('first_name','')} {emp.get('last_name','')}".strip()
 else:
     employer_name = "N/A"
@@ -123,7 +107,7 @@ st.text_input("Job Salary", selected.get('job_salary',''), disabled=True)
 
 # 7) Employees
 st.markdown("#### Employee")
-emps = match_results_df[match_results_df['findjob_id'] == selected.get('findjob_id')]
+emps = repo.find("match_results", findjob_id=selected.get('findjob_id', ''))
 if not emps.empty:
     names = emps.drop_duplicates(subset=["email"])[["first_name","last_name"]]
     for _, e in names.iterrows():
@@ -134,10 +118,12 @@ else:
 # 8) Actions
 col1, col2 = st.columns(2)
 def update_done(status_label: str):
-    df = match_results_df
+    where = {"findjob_id": selected.get("findjob_id", "")}
+    if selected.get("job_id"):
+        where["job_id"] = selected["job_id"]
     try:
-        idx = df.index[df["findjob_id"] == selected.get("findjob_id")][0] + 2
-        ws_match.update_acell(f"O{idx}", "Job Done")
+        if not repo.update("match_results", where, {"status": "Job Done"}):
+            raise LookupError(where)
         st.success(f"{status_label} saved Job Done!")
     except:
         st.error("Cannot update status.")
@@ -1,8 +1,6 @@
 import streamlit as st
 import pandas as pd
-import gspread
-import json
-from oauth2client.service_account import ServiceAccountCredentials
+from storage import get_repo
 
 # 1) Page config & login guard
 st.set_page_config(page_title="My Jobs | FAST LABOR", layout="wide")
@@ -12,68 +10,27 @@ if not st.session_state.get("logged_in", False):
 
 st.title("📄 My Jobs")
 
-# 2) Connect to Google Sheets
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
-creds_info = json.loads(st.secrets.get("gcp", {}).get("credentials", "{}"))
-if creds_info:
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_info, scope)
-else:
-    creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-gc = gspread.authorize(creds)
-
-try:
-    spreadsheet = gc.open("fastlabor")
-except Exception as e:
-    st.error(f"❌ ไม่สามารถเปิดสเปรดชีต fastlabor ได้: {e}")
-    st.stop()
-
-# 3) Helper: load sheet into DataFrame with error handling
-def load_df(sheet_name: str) -> pd.DataFrame:
-    try:
-        ws = spreadsheet.worksheet(sheet_name)
-    except gspread.exceptions.WorksheetNotFound:
-        st.error(f"❌ ไม่พบ worksheet ชื่อ '{sheet_name}'")
-        st.stop()
-    except Exception as e:
-        st.error(f"❌ เกิดข้อผิดพลาดขณะเปิด worksheet '{sheet_name}': {e}")
-        st.stop()
-
+# 2) Helper: this user's rows of a table (indexed lookup in storage.py)
+def load_df(table: str, email: str) -> pd.DataFrame:
     try:
-        vals = ws.get_all_values()
-    except gspread.exceptions.APIError as e:
-        st.error(f"❌ gspread APIError เมื่อดึงข้อมูลจาก '{sheet_name}': {e}")
-        st.stop()
+        df = get_repo().find(table, email=email)
     except Exception as e:
-        st.error(f"❌ เกิดข้อผิดพลาดขณะอ่านข้อมูลจาก '{sheet_name}': {e}")
+        st.error(f"❌ เกิดข้อผิดพลาดขณะอ่านข้อมูลจาก '{table}': {e}")
         st.stop()
+    return df.reset_index(drop=True)
 
-    if not vals or len(vals) < 2:
-        # empty sheet
-        return pd.DataFrame()
-
-    df = pd.DataFrame(vals[1:], columns=vals[0])
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
-    return df
-
-# load dataframes
-df_post = load_df("post_job")
-df_find = load_df("find_job")
-
-# 4) Filter only own records
+# 3) Load only own records
 user_email = st.session_state.get("email")
-df_post = df_post[df_post.email == user_email].reset_index(drop=True)
-df_find = df_find[df_find.email == user_email].reset_index(drop=True)
+df_post = load_df("post_job", user_email)
+df_find = load_df("find_job", user_email)
 
-# 5) Clean salary columns
+# 4) Clean salary columns
 for df in (df_post, df_find):
     for col in ("start_salary", "range_salary", "salary"):
         if col in df.columns:
             df[col] = df[col].astype(str).str.strip().replace({"": None})
 
-# 6) Tabs
+# 5) Tabs
 tab1, tab2 = st.tabs(["📌 Post Job", "🔍 Find Job"])
 
 with tab1:
@@ -151,7 +108,7 @@ with tab2:
                 st.session_state.pop("selected_job_id", None)
                 st.switch_page("pages/find_job_matching.py")
 
-# 7) Back to Home
+# 6) Back to Home
 st.divider()
 if st.button("🏠 หน้าแรก"):
     st.switch_page("pages/home.py")
@@ -1,8 +1,6 @@
 import streamlit as st
-import gspread
-import json
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
+from storage import get_repo
 
 # ✅ ตั้งค่า Streamlit
 st.set_page_config(page_title="My Full Profile", page_icon="🙍", layout="centered")
@@ -16,38 +14,19 @@ if not user_email:
     st.page_link("app.py", label="⬅️ กลับหน้า Login", icon="⬅️")
     st.stop()
 
-# ✅ Google Sheets API
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# ✅ โหลดข้อมูลผู้ใช้ (storage.py)
 try:
-    if "gcp" in st.secrets and "credentials" in st.secrets["gcp"]:
-        credentials_dict = json.loads(st.secrets["gcp"]["credentials"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-
-    client = gspread.authorize(creds)
-    sheet = client.open("fastlabor").sheet1
-    values = sheet.get_all_values()
-    headers = [h.strip().lower() for h in values[0]]
+    repo = get_repo()
+    profile_data = repo.first("users", email=user_email)
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถเชื่อมต่อกับ Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถเชื่อมต่อกับฐานข้อมูล: {e}")
     st.stop()
 
-# ✅ หาตำแหน่งแถวของผู้ใช้
-email_col = headers.index("email")
-user_row = next(
-    (i + 2 for i, row in enumerate(values[1:]) if len(row) > email_col and row[email_col] == user_email),
-    None
-)
-
-if not user_row:
+if not profile_data:
     st.error(f"⚠️ ไม่พบข้อมูลของ {user_email}")
     st.stop()
 
-user_data = sheet.row_values(user_row)
-profile_data = dict(zip(headers, user_data))
-
 # ✅ แปลงวันเกิดจาก string → datetime.date
 dob_str = profile_data.get("dob", "")
 try:
@@ -87,29 +66,25 @@ with st.form("edit_profile"):
 # ✅ บันทึกข้อมูล
 if submitted:
     try:
-        update_values = [
-            first_name, last_name, national_id, str(dob), gender, nationality,
-            address, province, district, subdistrict, zip_code, user_email
-        ]
-
-        # อัปเดตช่อง 1-12 (ไม่แก้ password)
-        for i, val in enumerate(update_values):
-            sheet.update_cell(user_row, i + 1, val)
-
-        # อัปเดตชื่อไฟล์เอกสาร (ช่อง 14-17)
-        doc_updates = []
+        # ข้อมูลส่วนตัว (ไม่แก้ email / password)
+        updates = {
+            "first_name": first_name, "last_name": last_name,
+            "national_id": national_id, "dob": str(dob), "gender": gender,
+            "nationality": nationality, "address": address, "province": province,
+            "district": district, "subdistrict": subdistrict, "zip_code": zip_code,
+        }
+
+        # ชื่อไฟล์เอกสาร (เฉพาะที่อัปโหลดใหม่)
         if certificate:
-            doc_updates.append((14, certificate.name))
+            updates["certificate"] = certificate.name
         if passport:
-            doc_updates.append((15, passport.name))
+            updates["passport"] = passport.name
         if visa:
-            doc_updates.append((16, visa.name))
+            updates["visa"] = visa.name
         if work_permit:
-            doc_updates.append((17, work_permit.name))
-
-        for col, filename in doc_updates:
-            sheet.update_cell(user_row, col, filename)
+            updates["work_permit"] = work_permit.name
 
+        repo.update("users", {"email": user_email}, updates)
         st.success("✅ บันทึกข้อมูลและเอกสารเรียบร้อยแล้ว!")
 
     except Exception as e:
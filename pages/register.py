@@ -3,26 +3,9 @@ import streamlit as st
 # ✅ ต้องเรียกก่อนคำสั่งอื่นทั้งหมด
 st.set_page_config(page_title="New Member Registration", page_icon="📝", layout="centered")
 
-import json
-import pandas as pd
-import gspread
 import datetime
-from oauth2client.service_account import ServiceAccountCredentials
-
-# ✅ โหลดข้อมูลจังหวัด อำเภอ ตำบล และรหัสไปรษณีย์
-@st.cache_data
-def load_location_data():
-    url_province = "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_province.json"
-    url_district = "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_amphure.json"
-    url_subdistrict = "https://raw.githubusercontent.com/kongvut/thai-province-data/master/api_tambon.json"
-
-    provinces = pd.read_json(url_province)
-    districts = pd.read_json(url_district)
-    subdistricts = pd.read_json(url_subdistrict)
-
-    return provinces, districts, subdistricts
-
-provinces, districts, subdistricts = load_location_data()
+import regions      # ✅ ข้อมูลจังหวัด อำเภอ ตำบล และรหัสไปรษณีย์ (ไฟล์ในเครื่อง, โหลดครั้งเดียว)
+from storage import get_repo, user_index
 
 # ✅ ตั้งค่า session_state สำหรับ dropdown ที่เกี่ยวข้อง
 for key, default in {
@@ -34,20 +17,12 @@ for key, default in {
     if key not in st.session_state:
         st.session_state[key] = default
 
-# ✅ ตั้งค่า Google Sheets API (Cloud หรือ Local)
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# ✅ เชื่อมต่อฐานข้อมูล (storage.py)
 try:
-    if "gcp" in st.secrets and "credentials" in st.secrets["gcp"]:
-        credentials_dict = json.loads(st.secrets["gcp"]["credentials"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-
-    client = gspread.authorize(creds)
-    sheet = client.open("fastlabor").sheet1  # เปลี่ยนเป็นชื่อ Google Sheets ของคุณ
+    repo = get_repo()
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถเชื่อมต่อกับ Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถเชื่อมต่อกับฐานข้อมูล: {e}")
     st.stop()
 
 # ✅ ส่วน UI
@@ -70,7 +45,7 @@ nationality = st.text_input("Nationality *")
 st.markdown("#### Address Information")
 address = st.text_area("Address (House Number, Road, Soi.) *")
 
-province_names = ["Select Province"] + provinces["name_th"].tolist()
+province_names = ["Select Province"] + regions.provinces()
 selected_province = st.selectbox("Province *", province_names, index=province_names.index(st.session_state.selected_province))
 
 if selected_province != st.session_state.selected_province:
@@ -82,8 +57,7 @@ if selected_province != st.session_state.selected_province:
 
 # ✅ District
 if selected_province != "Select Province":
-    province_id = provinces[provinces["name_th"] == selected_province]["id"].values[0]
-    filtered_districts = ["Select District"] + districts[districts["province_id"] == province_id]["name_th"].tolist()
+    filtered_districts = ["Select District"] + regions.districts(selected_province)
 else:
     filtered_districts = ["Select District"]
 
@@ -97,11 +71,8 @@ if selected_district != st.session_state.selected_district:
 
 # ✅ Subdistrict + Zip code
 if selected_district != "Select District":
-    district_id = districts[districts["name_th"] == selected_district]["id"].values[0]
-    filtered_subdistricts = subdistricts[subdistricts["amphure_id"] == district_id]
-
-    subdistrict_names = ["Select Subdistrict"] + filtered_subdistricts["name_th"].tolist()
-    zip_codes = filtered_subdistricts.set_index("name_th")["zip_code"].to_dict()
+    zip_codes = regions.zip_codes(selected_province, selected_district)
+    subdistrict_names = ["Select Subdistrict"] + list(zip_codes)
 else:
     subdistrict_names = ["Select Subdistrict"]
     zip_codes = {}
@@ -136,11 +107,16 @@ if submit_button:
     try:
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        sheet.append_row([
-            first_name, last_name, national_id, str(dob), gender, nationality,
-            address, selected_province, selected_district, selected_subdistrict,
-            st.session_state.zip_code, email, password, timestamp
-        ])
+        new_user = {
+            "first_name": first_name, "last_name": last_name,
+            "national_id": national_id, "dob": str(dob), "gender": gender,
+            "nationality": nationality, "address": address,
+            "province": selected_province, "district": selected_district,
+            "subdistrict": selected_subdistrict, "zip_code": st.session_state.zip_code,
+            "email": email, "password": password, "timestamp": timestamp,
+        }
+        repo.insert("users", new_user)
+        user_index().add(new_user)
 
         st.success("✅ ลงทะเบียนสำเร็จ!")
         st.session_state["user_email"] = email
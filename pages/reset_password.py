@@ -1,31 +1,13 @@
 import streamlit as st
-import gspread
-import json
-import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
-
-# ✅ ตั้งค่า Google Sheets API
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+from storage import get_repo, user_index
 
 try:
-    # ✅ โหลด Credentials จาก Streamlit Secrets (สำหรับ Cloud)
-    if "gcp" in st.secrets:
-        credentials_dict = json.loads(st.secrets["gcp"]["credentials"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-    else:
-        # ✅ โหลด Credentials จากไฟล์ (สำหรับ Local)
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-
-    # ✅ เชื่อมต่อ Google Sheets
-    client = gspread.authorize(creds)
-    sheet = client.open("fastlabor").sheet1  # เปลี่ยนเป็นชื่อ Google Sheets ของคุณ
-
-    # ✅ โหลดข้อมูลทั้งหมดจาก Google Sheets
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
+    # ✅ เชื่อมต่อฐานข้อมูลผู้ใช้ (storage.py)
+    repo = get_repo()
+    users = user_index()
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถเชื่อมต่อกับ Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถเชื่อมต่อกับฐานข้อมูล: {e}")
     st.stop()
 
 # ✅ ตั้งค่าหน้า Streamlit
@@ -49,13 +31,11 @@ if submit_button:
         st.error("❌ Passwords do not match. Please try again.")
     else:
         # ✅ ตรวจสอบว่าอีเมลมีอยู่ในระบบหรือไม่
-        if email in df["email"].values:
+        if email in users:
             try:
-                # ✅ ค้นหาแถวที่ต้องอัปเดตรหัสผ่าน
-                row_index = df[df["email"] == email].index[0] + 2  # แถวใน Google Sheets (index เริ่มที่ 0 + header)
-                
                 # ✅ อัปเดตรหัสผ่านใหม่
-                sheet.update_cell(row_index, df.columns.get_loc("password") + 1, new_password)
+                repo.update("users", {"email": email}, {"password": new_password})
+                users.set_password(email, new_password)
 
                 st.success("✅ Password updated successfully!")
             except Exception as e:
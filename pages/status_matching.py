@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
-import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from matching import encode_job_df, encode_worker_df, recommend_seekers
+from storage import get_repo
+from recommendations import materializer
 
 # --- 1) Page config & header ----------------------------
 st.set_page_config(page_title="Status Matching | FAST LABOR", layout="centered")
@@ -25,38 +23,17 @@ if not job_id:
     st.info("❌ กรุณากด ‘ดูสถานะการจับคู่’ จากหน้า My Jobs ก่อน")
     st.stop()
 
-# --- 3) Connect to Google Sheets ------------------------
-scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(
-    json.loads(st.secrets["gcp"]["credentials"]), scope
-)
-gc = gspread.authorize(creds)
-sh = gc.open("fastlabor")
+# --- 3-4) Load raw DataFrames (storage.py) --------------
+repo        = get_repo()
+raw_jobs    = repo.all("post_job")
+raw_seekers = repo.all("find_job")
 
-# --- 4) Load raw DataFrames -----------------------------
-raw_jobs    = pd.DataFrame(sh.worksheet("post_job")    .get_all_records())
-raw_seekers = pd.DataFrame(sh.worksheet("find_job")    .get_all_records())
-status_df   = pd.DataFrame(sh.worksheet("match_results").get_all_records())
-status_df["findjob_id"] = status_df["findjob_id"].astype(str)
-
-# --- 5) Compute Top-5 via your matching logic ------------
-jobs_enc    = encode_job_df(raw_jobs)
-seekers_enc = encode_worker_df(raw_seekers)
-idxs = jobs_enc.index[jobs_enc["job_id"] == job_id].tolist()
-if not idxs:
+# --- 5) Top-5 from the materialized recommendations -----
+if raw_jobs[raw_jobs["job_id"] == job_id].empty:
     st.error(f"❌ ไม่พบ Job ID = {job_id}")
     st.stop()
-job_enc = jobs_enc.loc[idxs[0]]
-
-# ask for more then dedupe
-original = recommend_seekers(job_enc, seekers_enc, n=50)
-unique, seen = [], set()
-for rec in original.itertuples(index=False):
-    if rec.email not in seen:
-        unique.append(rec)
-        seen.add(rec.email)
-    if len(unique) == 5:
-        break
+recs = materializer()
+top5 = recs.top("post_job", job_id)
 
 # --- helper fns ------------------------------------------
 def get_status_color(s: str) -> str:
@@ -76,9 +53,11 @@ def avg_salary(raw: pd.Series) -> str:
 
 # --- 6) Render Top-5 with status badges ---------------
 st.markdown(f"### Job ID: {job_id} — Top 5 Matches")
-for rank, rec in enumerate(unique, start=1):
-    # pull raw seeker by email
-    seeker = raw_seekers[raw_seekers["email"] == rec.email].iloc[0]
+if top5.empty and recs.warming_up:
+    st.info("⏳ กำลังคำนวณผลการจับคู่ กรุณารีเฟรชหน้านี้อีกครั้งในอีกสักครู่")
+for rank, rec in enumerate(top5.itertuples(index=False), start=1):
+    # pull raw seeker by findjob_id
+    seeker = raw_seekers[raw_seekers["findjob_id"] == rec.target_id].iloc[0]
     fid    = str(seeker["findjob_id"])
     name   = f"{seeker.first_name} {seeker.last_name}".strip() or "-"
     gender = seeker.gender or "-"
@@ -90,8 +69,8 @@ for rank, rec in enumerate(unique, start=1):
     jtype  = rec.job_type or "-"
 
     # lookup status
-    sr     = status_df[status_df["findjob_id"] == fid]
-    status = sr.iloc[0]["status"] if not sr.empty else "on queue"
+    sr     = repo.first("match_results", findjob_id=fid, job_id=job_id)
+    status = (sr or {}).get("status") or "on queue"
     color  = get_status_color(status)
 
     st.markdown(f"**Match No.{rank}**")
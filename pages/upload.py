@@ -1,23 +1,12 @@
 import streamlit as st
-import gspread
-import json
-from oauth2client.service_account import ServiceAccountCredentials
-
-# ✅ ตั้งค่า Google Sheets API
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+from storage import get_repo
 
+# ✅ เชื่อมต่อฐานข้อมูล (storage.py)
 try:
-    if "gcp" in st.secrets and "credentials" in st.secrets["gcp"]:
-        credentials_dict = json.loads(st.secrets["gcp"]["credentials"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name("pages/credentials.json", scope)
-
-    client = gspread.authorize(creds)
-    sheet = client.open("fastlabor").sheet1
+    repo = get_repo()
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถเชื่อมต่อกับ Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถเชื่อมต่อกับฐานข้อมูล: {e}")
     st.stop()
 
 # ✅ ตรวจสอบ session
@@ -27,25 +16,14 @@ if "user_email" not in st.session_state:
 
 user_email = st.session_state["user_email"]
 
-# ✅ ดึงข้อมูลทั้งหมดจาก Google Sheets
+# ✅ ตรวจสอบว่ามีผู้ใช้นี้ในระบบ
 try:
-    values = sheet.get_all_values()
-    raw_headers = values[0]
-    headers = [h.strip().lower() for h in raw_headers]
-
-    if "email" not in headers:
-        st.error("❌ ไม่พบคอลัมน์ 'email' ใน Google Sheets")
-        st.stop()
-
-    email_col = headers.index("email")
-    user_row = next((i + 2 for i, row in enumerate(values[1:]) if len(row) > email_col and row[email_col] == user_email), None)
-
-    if not user_row:
-        st.error(f"⚠️ ไม่พบข้อมูลผู้ใช้ {user_email} ใน Google Sheets")
+    if repo.first("users", email=user_email) is None:
+        st.error(f"⚠️ ไม่พบข้อมูลผู้ใช้ {user_email} ในระบบ")
         st.stop()
 
 except Exception as e:
-    st.error(f"❌ ไม่สามารถดึงข้อมูลจาก Google Sheets: {e}")
+    st.error(f"❌ ไม่สามารถดึงข้อมูลผู้ใช้: {e}")
     st.stop()
 
 # ✅ ตั้งค่าหน้า
@@ -64,25 +42,19 @@ work_permit = st.file_uploader("หนังสืออนุญาตทำง
 
 if st.button("Upload"):
     try:
-        updates = []
-
-        certificate_col = 14
-        passport_col = 15
-        visa_col = 16
-        work_permit_col = 17
+        updates = {}
 
         if certificate:
-            updates.append((certificate_col, certificate.name))
+            updates["certificate"] = certificate.name
         if passport:
-            updates.append((passport_col, passport.name))
+            updates["passport"] = passport.name
         if visa:
-            updates.append((visa_col, visa.name))
+            updates["visa"] = visa.name
         if work_permit:
-            updates.append((work_permit_col, work_permit.name))
+            updates["work_permit"] = work_permit.name
 
         if updates:
-            for col, filename in updates:
-                sheet.update_cell(user_row, col, filename)
+            repo.update("users", {"email": user_email}, updates)
             st.success(f"✅ อัปโหลดสำเร็จสำหรับ {user_email}!")
 
             # ✅ เปลี่ยนหน้าไป verification.py
@@ -9,15 +9,14 @@
 
 from __future__ import annotations
 
-import json
 import uuid
 from datetime import datetime
 from pathlib import Path
 
-import gspread
 import pandas as pd
 import streamlit as st
-from oauth2client.service_account import ServiceAccountCredentials
+
+from storage import get_repo
 
 # ------------------------------------------------------------------
 # 0) Guard: ต้อง Login และมี job_idx & recs ใน session
@@ -37,20 +36,9 @@ if job_idx is None or recs is None:
 # ------------------------------------------------------------------
 # 1) กำหนด Google‑Sheets helper
 # ------------------------------------------------------------------
-scope = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
-creds_json = json.loads(st.secrets["gcp"]["credentials"])
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
-client = gspread.authorize(creds)
-sh = client.open("fastlabor")
-
-jobs_ws     = sh.worksheet("post_job")
-matches_ws  = sh.worksheet("matches")
-
 # รับข้อมูล row งานนี้
-jobs_df = pd.DataFrame(jobs_ws.get_all_values()[1:], columns=jobs_ws.get_all_values()[0])
+repo = get_repo()
+jobs_df = repo.all("post_job")
 job_row = jobs_df.iloc[job_idx]
 
 st.title("📋 Review Matched – ตรวจรายชื่อแรงงาน")
@@ -71,15 +59,15 @@ for i, row in recs.iterrows():
         if st.button("📨 Invite", key=f"invite_{i}"):
             # สร้าง match_id วนซ้ำไม่ซ้ำ
             match_id = str(uuid.uuid4())[:8]
-            matches_ws.append_row([
-                match_id,
-                job_row["job_id"],
-                row["worker_id"],
-                pr,
-                "invited",
-                f"{row['ai_score']:.4f}",
-                datetime.utcnow().isoformat(sep=" ", timespec="seconds")
-            ])
+            repo.insert("matches", {
+                "match_id":   match_id,
+                "job_id":     job_row["job_id"],
+                "worker_id":  row["worker_id"],
+                "priority":   pr,
+                "status":     "invited",
+                "ai_score":   f"{row['ai_score']:.4f}",
+                "created_at": datetime.utcnow().isoformat(sep=" ", timespec="seconds"),
+            })
             st.success("ส่งคำเชิญสำเร็จ!")
             invited_cnt += 1
 
@@ -0,0 +1,196 @@
+# recommendations.py
+"""
+Materialized top-N recommendations, kept fresh by a background thread.
+
+The "recommendations" table holds, per job post, the best job searches
+(seekers) and, per job search, the best job posts, so pages render a
+lookup instead of encoding and ranking inside the request:
+
+    from recommendations import materializer
+    recs = materializer()                    # starts the refresher once per process
+    top5 = recs.top("post_job", job_id)      # seekers for a job post, ranked
+    recs.notify("find_job", findjob_id)      # after a new / edited search
+
+The refresher re-ranks every post and search in one batched pass per side
+(shared FAISS indexes synced first), DEBOUNCE_SECONDS after a burst of
+notify() events and otherwise every REFRESH_SECONDS.  A source that was
+notified but not re-ranked yet is computed on demand by top() (that one
+row, against the shared index as it stands), so a page opened right after
+a post never shows a stale or missing list; everything else is served
+from the table as it is, and a cold process never ranks inline.
+
+Results are derived data: they live in the local SQLite file only, even
+when the primary store is Google Sheets.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from storage import DB_PATH, Repository, SQLiteRepository, SyncedRepository, get_repo
+
+log = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------ #
+# 1) Config
+# ------------------------------------------------------------------ #
+TOP_N            = int(os.environ.get("FASTLABOR_RECS_N", 5))
+SEARCH_K         = int(os.environ.get("FASTLABOR_RECS_K", 50))      # candidates scored per source
+REFRESH_SECONDS  = float(os.environ.get("FASTLABOR_RECS_REFRESH", 300))
+DEBOUNCE_SECONDS = 2.0
+
+# source table -> (its id, candidate table, candidate id, one result per value of)
+SIDES = {
+    "post_job": ("job_id",     "find_job", "findjob_id", "email"),    # seekers for a job post
+    "find_job": ("findjob_id", "post_job", "job_id",     "job_id"),   # jobs for a job search
+}
+
+
+def _encode(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    from matching import encode_job_df, encode_worker_df
+    return encode_job_df(df) if table == "post_job" else encode_worker_df(df)
+
+
+def _index(table: str):
+    from matching import shared_index
+    return shared_index(table, id_col=SIDES[table][0], partitioned=True)
+
+
+def _ranked(table: str, queries: pd.DataFrame, now: str) -> list[dict]:
+    """Top-N rows for every query of `table` against the other side's shared index."""
+    from matching import recommend_batch
+    id_col, cand_table, cand_id, unique_on = SIDES[table]
+    queries = queries.reset_index(drop=True)
+    out = recommend_batch(queries, k=SEARCH_K, n=TOP_N, index=_index(cand_table), dedupe_on=unique_on)
+    if out.empty:
+        return []
+    source_ids = queries[id_col].to_numpy()[out["worker_index"].to_numpy(dtype=int)]
+    return [
+        {"kind": table, "source_id": sid, "rank": r, "target_id": tid,
+         "email": email, "job_type": jtype, "ai_score": f"{score:.6f}", "computed_at": now}
+        for sid, r, tid, email, jtype, score in zip(
+            source_ids, out["rank"], out[cand_id], out["email"], out["job_type"], out["ai_score"]
+        )
+    ]
+
+
+def _local_store(repo: Repository) -> SQLiteRepository:
+    if isinstance(repo, SyncedRepository):
+        repo = repo.primary
+    return repo if isinstance(repo, SQLiteRepository) else SQLiteRepository(DB_PATH)
+
+# ------------------------------------------------------------------ #
+# 2) Materializer
+# ------------------------------------------------------------------ #
+class Materializer:
+    def __init__(self, repo: Repository | None = None, store: SQLiteRepository | None = None):
+        self.repo = repo or get_repo()
+        self.store = store or _local_store(self.repo)
+        self.last_refresh = 0.0                       # time.time() of the last full pass
+        self._pending: set[tuple[str, str]] = set()   # (table, id) notified, not re-ranked since
+        self._changed: set[tuple[str, str]] = set()   # notified during the running pass
+        self._state_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()         # one ranking pass at a time
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Run the refresher thread (first pass immediately)."""
+        with self._state_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="recs-refresh", daemon=True)
+                self._thread.start()
+                self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            if self._wake.wait(REFRESH_SECONDS):
+                time.sleep(DEBOUNCE_SECONDS)          # let a burst of events coalesce
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("Recommendation refresh failed")
+
+    # -------------------------------------------------------------- #
+    def notify(self, table: str, source_id: str | None = None) -> None:
+        """A row of `table` was added or edited (None: anything may have changed)."""
+        if table not in SIDES:
+            raise KeyError(f"Unknown table {table!r}")
+        if source_id is not None:
+            key = (table, str(source_id))
+            with self._state_lock:
+                self._pending.add(key)
+                self._changed.add(key)
+        self._wake.set()
+
+    def refresh(self) -> None:
+        """Re-rank every job post and job search and swap the results in."""
+        with self._refresh_lock:
+            with self._state_lock:
+                self._changed = set()
+            now = datetime.now().isoformat(timespec="seconds")
+            encoded = {t: _encode(t, self.repo.all(t)) for t in SIDES}
+            for table, df in encoded.items():
+                _index(table).sync(df)
+            for table, df in encoded.items():
+                self.store.replace("recommendations", {"kind": table}, _ranked(table, df, now))
+            with self._state_lock:
+                # rows notified since the pass read them stay pending
+                self._pending = set(self._changed)
+            self.last_refresh = time.time()
+
+    def refresh_one(self, table: str, source_id: str) -> None:
+        """Re-rank a single job post / job search against the current shared index."""
+        source_id = str(source_id)
+        with self._state_lock:
+            self._pending.discard((table, source_id))     # a notify() from here on re-adds it
+        id_col = SIDES[table][0]
+        row = self.repo.find(table, **{id_col: source_id})
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = _ranked(table, _encode(table, row.head(1)), now) if not row.empty else []
+        self.store.replace("recommendations", {"kind": table, "source_id": source_id}, rows)
+
+    @property
+    def warming_up(self) -> bool:
+        """No full pass has finished in this process yet (results may be missing)."""
+        return not self.last_refresh
+
+    # -------------------------------------------------------------- #
+    def top(self, table: str, source_id: str) -> pd.DataFrame:
+        """
+        Materialized recommendations for one job post ("post_job") or job
+        search ("find_job"), best first: target_id (the recommended row's
+        id), email, job_type, ai_score, rank.  Only a source notified since
+        it was last ranked is re-ranked here; the rest is a table lookup.
+        """
+        source_id = str(source_id)
+        with self._state_lock:
+            pending = (table, source_id) in self._pending
+        if pending:
+            self.refresh_one(table, source_id)
+        df = self.store.find("recommendations", kind=table, source_id=source_id)
+        df = df.astype({"rank": int, "ai_score": float})
+        return df.sort_values("rank").reset_index(drop=True)
+
+# ------------------------------------------------------------------ #
+# 3) Process-wide materializer
+# ------------------------------------------------------------------ #
+_MATERIALIZER: Materializer | None = None
+_MATERIALIZER_LOCK = threading.Lock()
+
+
+def materializer() -> Materializer:
+    """The process-wide Materializer, with its refresher thread running."""
+    global _MATERIALIZER
+    with _MATERIALIZER_LOCK:
+        if _MATERIALIZER is None:
+            _MATERIALIZER = Materializer()
+            _MATERIALIZER.start()
+        return _MATERIALIZER
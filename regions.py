@@ -0,0 +1,139 @@
+# regions.py
+"""
+Thai administrative regions (province → district → subdistrict → zip),
+loaded once per process from the vendored thai_regions.json.
+
+    import regions
+    regions.provinces()                               # ["กรุงเทพมหานคร", ...]
+    regions.districts("กรุงเทพมหานคร")                 # O(1) dict lookups
+    regions.subdistricts("กรุงเทพมหานคร", "พระนคร")
+    regions.zip_code("กรุงเทพมหานคร", "พระนคร", "วัดราชบพิธ")   # "10200"
+    regions.latlon("กรุงเทพมหานคร", "พระนคร")          # centroid (lat, lon)
+
+District / subdistrict arguments may carry the administrative prefix
+("เขตพระนคร", "แขวงวัดราชบพิธ", as stored by the older kongvut-based
+forms); canonical() drops it, so both spellings find the same entry.
+
+Data: thaiaddress 0.2.1 (thai_address_data.csv), Apache License 2.0,
+(c) 2020 Titipat Achakulvisut, 425 Degree Co.  Rebuild the JSON with
+`python regions.py <thai_address_data.csv>`.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# ------------------------------------------------------------------ #
+# 1) Load
+# ------------------------------------------------------------------ #
+DATA_PATH = Path(__file__).parent / "thai_regions.json"
+
+
+@lru_cache(maxsize=1)
+def _tree() -> dict[str, dict[str, dict[str, list]]]:
+    """{province: {district: {subdistrict: [zip, lat, lon]}}}"""
+    with open(DATA_PATH, encoding="utf-8") as fh:
+        return json.load(fh)["provinces"]
+
+# ------------------------------------------------------------------ #
+# 2) Lookups (unknown names give empty results, never raise)
+# ------------------------------------------------------------------ #
+# no name in the data starts with one of these
+PREFIX_RE = re.compile(r"^\s*(?:เขต|แขวง|อำเภอ|ตำบล)\s*")
+
+
+def canonical(name: str | None) -> str:
+    """District / subdistrict name as keyed in the data: "เขตพระนคร" -> "พระนคร"."""
+    return PREFIX_RE.sub("", name or "").strip()
+
+
+def provinces() -> list[str]:
+    return list(_tree())
+
+
+def _districts(province: str) -> dict[str, dict[str, list]]:
+    return _tree().get((province or "").strip(), {})
+
+
+def _subdistricts(province: str, district: str) -> dict[str, list]:
+    return _districts(province).get(canonical(district), {})
+
+
+def districts(province: str) -> list[str]:
+    return list(_districts(province))
+
+
+def subdistricts(province: str, district: str) -> list[str]:
+    return list(_subdistricts(province, district))
+
+
+def zip_codes(province: str, district: str) -> dict[str, str]:
+    """subdistrict -> zip code for one district."""
+    return {s: v[0] for s, v in _subdistricts(province, district).items()}
+
+
+def zip_code(province: str, district: str, subdistrict: str) -> str:
+    entry = _subdistricts(province, district).get(canonical(subdistrict))
+    return entry[0] if entry else ""
+
+
+def _centroid(entries) -> tuple[float, float] | None:
+    pts = [(e[1], e[2]) for e in entries if e[1] is not None]
+    if not pts:
+        return None
+    return sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts)
+
+
+def latlon(province: str,
+           district: str | None = None,
+           subdistrict: str | None = None) -> tuple[float, float] | None:
+    """
+    Coordinates of the most specific level given; districts and provinces
+    use the mean of their subdistrict points.  None if unknown.
+    """
+    dists = _districts(province)
+    if not dists:
+        return None
+    district, subdistrict = canonical(district), canonical(subdistrict)
+    if district and district in dists:
+        subs = dists[district]
+        if subdistrict and subdistrict in subs:
+            return _centroid([subs[subdistrict]])
+        return _centroid(subs.values())
+    return _centroid(e for subs in dists.values() for e in subs.values())
+
+# ------------------------------------------------------------------ #
+# 3) Rebuild from the upstream CSV
+# ------------------------------------------------------------------ #
+def build(csv_path: str | Path, out_path: str | Path = DATA_PATH) -> None:
+    import csv
+
+    tree: dict[str, dict[str, dict[str, list]]] = {}
+    with open(csv_path, encoding="utf-8", newline="") as fh:
+        for r in csv.DictReader(fh):
+            lat, lon = (
+                (round(float(r["latitude"]), 3), round(float(r["longitude"]), 3))
+                if r["latitude"] not in ("", "null") else (None, None)
+            )
+            tree.setdefault(r["province"], {}).setdefault(r["district"], {})[r["subdistrict"]] = [
+                r["zipcode"], lat, lon
+            ]
+    doc = {
+        "source": "thaiaddress 0.2.1 thai_address_data.csv (Apache-2.0)",
+        "provinces": tree,
+    }
+    with open(out_path, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh, ensure_ascii=False, separators=(",", ":"))
+        fh.write("\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python regions.py <thai_address_data.csv>")
+    build(sys.argv[1])
+    _tree.cache_clear()
+    print(f"{len(provinces())} provinces -> {DATA_PATH.name}")
@@ -0,0 +1,161 @@
+# sheets.py
+"""
+Shared Google Sheets data layer for all pages.
+
+• one authorized gspread client / spreadsheet handle per server process
+• per-worksheet DataFrame snapshots cached for DEFAULT_TTL seconds
+• writes go through append_rows / batch_update here (one API call per
+  user action), which bump the worksheet's version so the next read_df()
+  refetches it; row numbers and counts used for writes and new ids are
+  read fresh (key columns only), never from a snapshot
+
+    from sheets import read_df, append_row
+    jobs = read_df("post_job")             # served from cache when fresh
+    append_row("post_job", [...])          # write + invalidate
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import gspread
+import pandas as pd
+import streamlit as st
+from gspread.utils import rowcol_to_a1
+from oauth2client.service_account import ServiceAccountCredentials
+
+import timing
+
+# ------------------------------------------------------------------ #
+# 1) Constants
+# ------------------------------------------------------------------ #
+SPREADSHEET = "fastlabor"
+USERS       = "sheet1"      # first worksheet (registered users)
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+]
+CREDENTIALS_FILE = "pages/credentials.json"
+DEFAULT_TTL = 60            # seconds a snapshot may be served without refetching
+
+# ------------------------------------------------------------------ #
+# 2) Pooled client & worksheet handles
+# ------------------------------------------------------------------ #
+@st.cache_resource(show_spinner=False)
+def get_client() -> gspread.Client:
+    if "gcp" in st.secrets and "credentials" in st.secrets["gcp"]:
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(
+            json.loads(st.secrets["gcp"]["credentials"]), SCOPE
+        )
+    else:
+        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
+    return gspread.authorize(creds)
+
+
+@st.cache_resource(show_spinner=False)
+def get_spreadsheet() -> gspread.Spreadsheet:
+    return get_client().open(SPREADSHEET)
+
+
+@st.cache_resource(show_spinner=False)
+def worksheet(name: str) -> gspread.Worksheet:
+    """Worksheet handle by title; USERS ("sheet1") is the first worksheet."""
+    sh = get_spreadsheet()
+    return sh.sheet1 if name == USERS else sh.worksheet(name)
+
+# ------------------------------------------------------------------ #
+# 3) Cached reads
+# ------------------------------------------------------------------ #
+_versions: dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+
+@st.cache_data(ttl=DEFAULT_TTL, show_spinner=False)
+def _values(name: str, version: int) -> list[list[str]]:
+    # `version` only keys the cache: invalidate() bumps it
+    with timing.stage("sheets_download", sheet=name) as rec:
+        vals = worksheet(name).get_all_values()
+        rec["rows"] = max(len(vals) - 1, 0)
+    return vals
+
+
+def read_values(name: str, fresh: bool = False) -> list[list[str]]:
+    """
+    Header row + data rows, as returned by get_all_values().  `fresh`
+    bypasses the cache, e.g. before computing a row number to write to.
+    """
+    if fresh:
+        invalidate(name)
+    return _values(name, _versions.get(name, 0))
+
+
+def read_df(name: str) -> pd.DataFrame:
+    """Worksheet as a DataFrame of strings with normalized column names."""
+    vals = read_values(name)
+    if not vals:
+        return pd.DataFrame()
+    df = pd.DataFrame(vals[1:], columns=vals[0])
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    return df
+
+
+def invalidate(name: str) -> None:
+    """Drop the cached snapshot of `name`; the next read refetches it."""
+    with _versions_lock:
+        _versions[name] = _versions.get(name, 0) + 1
+
+
+def version(name: str) -> tuple[int, int]:
+    """
+    Changes whenever read_values(name) may return different data: after
+    invalidate() and once per DEFAULT_TTL.  Free (no API call or cache read),
+    so callers can cheaply tell whether something derived from a snapshot
+    is out of date.
+    """
+    return _versions.get(name, 0), int(time.time() // DEFAULT_TTL)
+
+# ------------------------------------------------------------------ #
+# 4) Writes (one API call each; each invalidates the worksheet it touches)
+# ------------------------------------------------------------------ #
+def row_count(name: str) -> int:
+    """
+    Rows in `name` including the header, read fresh (column A only) so rows
+    appended by other server processes or by hand are counted.
+    """
+    return len(worksheet(name).col_values(1))
+
+
+def read_columns(name: str, cols: list[int]) -> list[list[str]]:
+    """Columns `cols` (1-based, header included) of `name`, read fresh in one call."""
+    letters = [rowcol_to_a1(1, c).rstrip("0123456789") for c in cols]
+    got = worksheet(name).batch_get([f"{a}:{a}" for a in letters], major_dimension="COLUMNS")
+    return [list(v[0]) if v else [] for v in got]
+
+
+def append_rows(name: str, rows: list[list]) -> None:
+    if not rows:
+        return
+    worksheet(name).append_rows(rows)
+    invalidate(name)
+
+
+def append_row(name: str, row: list) -> None:
+    append_rows(name, [row])
+
+
+def batch_update(name: str, cells: dict[tuple[int, int], object]) -> None:
+    """Write {(row, col): value} (1-based) in a single values:batchUpdate call."""
+    if not cells:
+        return
+    data = [
+        {"range": rowcol_to_a1(r, c), "values": [[v]]}
+        for (r, c), v in sorted(cells.items())
+    ]
+    worksheet(name).batch_update(data, value_input_option="USER_ENTERED")
+    invalidate(name)
+
+
+def update_cell(name: str, row: int, col: int, value) -> None:
+    batch_update(name, {(row, col): value})
@@ -0,0 +1,575 @@
+# storage.py
+"""
+Repository layer for users, job posts, job searches and match results.
+
+Pages talk to a `Repository` instead of gspread:
+
+    from storage import get_repo, user_index
+    repo = get_repo()
+    ok   = user_index().check(email, pwd)                   # O(1): digest map or indexed row
+    mine = repo.find("post_job", email=email)
+    repo.insert("find_job", {...})
+
+Backends (FASTLABOR_STORAGE):
+  • "sheets" -> the "fastlabor" Google spreadsheet via sheets.py; the
+                default until deployments have migrated
+  • "sqlite" -> local file FASTLABOR_DB (WAL, indexed on email / job_id /
+                findjob_id); the one used offline/in tests
+
+With FASTLABOR_SHEETS_SYNC=1 the SQLite backend also mirrors every write to
+the spreadsheet, and an empty SQLite file (first start, or a host whose disk
+was wiped) is seeded from it.  `python storage.py import-sheets` replaces
+the SQLite tables with the current spreadsheet.
+
+All values are stored and returned as strings, like the sheets they replace.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------ #
+# 1) Schema (column order = sheet column order)
+# ------------------------------------------------------------------ #
+SCHEMA: dict[str, list[str]] = {
+    "users": [
+        "first_name", "last_name", "national_id", "dob", "gender", "nationality",
+        "address", "province", "district", "subdistrict", "zip_code",
+        "email", "password",
+        "certificate", "passport", "visa", "work_permit", "timestamp",
+    ],
+    "post_job": [
+        "job_id", "first_name", "last_name", "gender", "email",
+        "job_type", "job_detail", "salary", "job_date",
+        "start_time", "end_time", "job_address",
+        "province", "district", "subdistrict", "zip_code",
+    ],
+    "find_job": [
+        "findjob_id", "first_name", "last_name", "email",
+        "job_type", "skills", "job_date", "start_time", "end_time", "job_address",
+        "province", "district", "subdistrict", "zip_code",
+        "start_salary", "range_salary", "gender",
+    ],
+    "match_results": [
+        "findjob_id", "first_name", "last_name", "email",
+        "job_type", "skills", "job_date", "start_time", "end_time", "job_address",
+        "province", "district", "subdistrict", "zip_code",
+        "status", "job_id", "priority", "job_salary", "ai_score",
+        "start_salary", "range_salary", "gender",
+    ],
+    "matches": [
+        "match_id", "job_id", "worker_id", "priority", "status", "ai_score", "created_at",
+    ],
+    # derived, local only (see recommendations.py): top-N per job post / job search
+    "recommendations": [
+        "kind", "source_id", "rank", "target_id", "email", "job_type", "ai_score", "computed_at",
+    ],
+}
+
+INDEXES: dict[str, list[str]] = {
+    "users":         ["email"],
+    "post_job":      ["job_id", "email"],
+    "find_job":      ["findjob_id", "email"],
+    "match_results": ["findjob_id", "job_id", "email"],
+    "matches":       ["job_id"],
+    "recommendations": ["source_id"],
+}
+
+# table -> worksheet title (tables without one are never sent to Sheets)
+SHEET_NAMES = {
+    "users":         "sheet1",
+    "post_job":      "post_job",
+    "find_job":      "find_job",
+    "match_results": "match_results",
+    "matches":       "matches",
+}
+
+BACKEND     = os.environ.get("FASTLABOR_STORAGE", "sheets")      # "sheets" | "sqlite"
+DB_PATH     = Path(os.environ.get("FASTLABOR_DB", Path(__file__).parent / "fastlabor.db"))
+SHEETS_SYNC = os.environ.get("FASTLABOR_SHEETS_SYNC", "0") == "1"
+
+
+def _check(table: str, cols) -> list[str]:
+    if table not in SCHEMA:
+        raise KeyError(f"Unknown table {table!r}")
+    unknown = [c for c in cols if c not in SCHEMA[table]]
+    if unknown:
+        raise KeyError(f"Unknown column(s) for {table}: {unknown}")
+    return list(cols)
+
+
+def _str(v) -> str:
+    return "" if v is None else str(v)
+
+
+def _q(name: str) -> str:
+    return f'"{name}"'
+
+# ------------------------------------------------------------------ #
+# 2) Interface
+# ------------------------------------------------------------------ #
+class Repository(ABC):
+    """
+    Table-level CRUD over SCHEMA.  `where` filters are exact string
+    equality on every given column; row keys outside the schema are
+    ignored on insert.
+    """
+
+    @abstractmethod
+    def all(self, table: str) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def find(self, table: str, **where) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def count(self, table: str) -> int:
+        ...
+
+    @abstractmethod
+    def insert_many(self, table: str, rows: list[dict]) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, table: str, where: dict, values: dict) -> int:
+        """Set `values` on every row matching `where`; returns rows touched."""
+
+    def snapshot_version(self, table: str):
+        """
+        Token that changes whenever all(table) may return different rows, for
+        backends that serve cached snapshots; None when reads are live and
+        find() is an indexed lookup.
+        """
+        return None
+
+    # -------------------------------------------------------------- #
+    def first(self, table: str, **where) -> dict | None:
+        df = self.find(table, **where)
+        return None if df.empty else df.iloc[0].to_dict()
+
+    def insert(self, table: str, row: dict) -> None:
+        self.insert_many(table, [row])
+
+    @contextmanager
+    def batch(self):
+        """Group the writes of one user action; backends may coalesce them."""
+        yield
+
+# ------------------------------------------------------------------ #
+# 3) SQLite backend
+# ------------------------------------------------------------------ #
+class SQLiteRepository(Repository):
+    def __init__(self, path: str | Path = DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()       # one connection per thread
+        self._create()
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _create(self) -> None:
+        con = self._conn()
+        with con:
+            for table, cols in SCHEMA.items():
+                col_sql = ", ".join(f"{_q(c)} TEXT NOT NULL DEFAULT ''" for c in cols)
+                con.execute(f"CREATE TABLE IF NOT EXISTS {_q(table)} ({col_sql})")
+                # columns added to SCHEMA after the file was created
+                have = {r[1] for r in con.execute(f"PRAGMA table_info({_q(table)})")}
+                for c in cols:
+                    if c not in have:
+                        con.execute(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(c)} TEXT NOT NULL DEFAULT ''")
+                for col in INDEXES.get(table, []):
+                    con.execute(
+                        f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{table}_{col}')} ON {_q(table)} ({_q(col)})"
+                    )
+
+    @staticmethod
+    def _where_sql(table: str, where: dict) -> tuple[str, list[str]]:
+        cols = _check(table, where)
+        if not cols:
+            return "", []
+        return " WHERE " + " AND ".join(_q(c) + " = ?" for c in cols), [_str(where[c]) for c in cols]
+
+    # -------------------------------------------------------------- #
+    def all(self, table: str) -> pd.DataFrame:
+        return self.find(table)
+
+    def find(self, table: str, **where) -> pd.DataFrame:
+        clause, params = self._where_sql(table, where)
+        cols = ", ".join(map(_q, SCHEMA[table]))
+        cur = self._conn().execute(f"SELECT {cols} FROM {_q(table)}{clause} ORDER BY rowid", params)
+        return pd.DataFrame(cur.fetchall(), columns=SCHEMA[table])
+
+    def count(self, table: str) -> int:
+        _check(table, [])
+        return self._conn().execute(f"SELECT COUNT(*) FROM {_q(table)}").fetchone()[0]
+
+    def insert_many(self, table: str, rows: list[dict]) -> None:
+        _check(table, [])
+        cols = SCHEMA[table]
+        params = [[_str(r.get(c)) for c in cols] for r in rows]
+        if not params:
+            return
+        sql = (f'INSERT INTO {_q(table)} ({", ".join(map(_q, cols))}) '
+               f'VALUES ({", ".join("?" * len(cols))})')
+        con = self._conn()
+        with con:
+            con.executemany(sql, params)
+
+    def update(self, table: str, where: dict, values: dict) -> int:
+        set_cols = _check(table, values)
+        if not set_cols:
+            return 0
+        clause, params = self._where_sql(table, where)
+        sql = f'UPDATE {_q(table)} SET {", ".join(_q(c) + " = ?" for c in set_cols)}{clause}'
+        con = self._conn()
+        with con:
+            return con.execute(sql, [_str(values[c]) for c in set_cols] + params).rowcount
+
+    def replace(self, table: str, where: dict, rows: list[dict]) -> None:
+        """Delete the rows matching `where` and insert `rows`, in one transaction."""
+        clause, params = self._where_sql(table, where)
+        cols = SCHEMA[table]
+        sql = (f'INSERT INTO {_q(table)} ({", ".join(map(_q, cols))}) '
+               f'VALUES ({", ".join("?" * len(cols))})')
+        con = self._conn()
+        with con:
+            con.execute(f"DELETE FROM {_q(table)}{clause}", params)
+            con.executemany(sql, [[_str(r.get(c)) for c in cols] for r in rows])
+
+# ------------------------------------------------------------------ #
+# 4) Google Sheets backend
+# ------------------------------------------------------------------ #
+class _WriteBatch:
+    """Writes queued inside SheetsRepository.batch()."""
+
+    def __init__(self):
+        self.appends: dict[str, list[dict]] = {}                 # table -> rows
+        self.cells: dict[str, dict[tuple[int, int], str]] = {}   # table -> {(row, col): value}
+
+
+class SheetsRepository(Repository):
+    """
+    The spreadsheet as a repository.  Rows are written in the worksheet's
+    own header order (SCHEMA order for columns it does not name); lookups
+    filter the TTL-cached snapshot from sheets.py.
+    """
+
+    def __init__(self):
+        import sheets                         # needs streamlit + gspread
+        self._sheets = sheets
+        self._local = threading.local()       # per-thread open batch()
+
+    def _title(self, table: str) -> str:
+        _check(table, [])
+        return SHEET_NAMES[table]
+
+    def _worksheet(self, table: str):
+        import gspread
+        title = self._title(table)
+        try:
+            return self._sheets.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            ws = self._sheets.get_spreadsheet().add_worksheet(
+                title=title, rows="1000", cols=str(len(SCHEMA[table]))
+            )
+            ws.append_row(SCHEMA[table])
+            self._sheets.invalidate(title)
+            return ws
+
+    def _headers(self, table: str) -> list[str]:
+        vals = self._sheets.read_values(self._title(table))
+        return [h.strip().lower().replace(" ", "_") for h in vals[0]] if vals else []
+
+    def _col(self, table: str, headers: list[str], name: str) -> int:
+        """1-based worksheet column for `name`."""
+        return headers.index(name) + 1 if name in headers else SCHEMA[table].index(name) + 1
+
+    # -------------------------------------------------------------- #
+    def all(self, table: str) -> pd.DataFrame:
+        self._worksheet(table)
+        return self._sheets.read_df(self._title(table))
+
+    def find(self, table: str, **where) -> pd.DataFrame:
+        cols = _check(table, where)
+        df = self.all(table)
+        if df.empty:
+            return df
+        mask = pd.Series(True, index=df.index)
+        for c in cols:
+            if c not in df.columns:
+                return df.iloc[0:0]
+            mask &= df[c] == _str(where[c])
+        return df[mask]
+
+    def snapshot_version(self, table: str):
+        return self._sheets.version(self._title(table))
+
+    def count(self, table: str) -> int:
+        self._worksheet(table)
+        pending = self._pending()
+        queued = len(pending.appends.get(table, [])) if pending else 0
+        return max(self._sheets.row_count(self._title(table)) - 1, 0) + queued
+
+    def insert_many(self, table: str, rows: list[dict]) -> None:
+        with self.batch() as pending:
+            pending.appends.setdefault(table, []).extend(rows)
+
+    def update(self, table: str, where: dict, values: dict) -> int:
+        set_cols = _check(table, values)
+        if not set_cols:
+            return 0
+        self._worksheet(table)
+        headers = self._headers(table)
+        keys = _check(table, where) or headers[:1]
+        if not keys or any(c not in headers for c in keys):
+            return 0
+        # row numbers from a fresh read of the key columns, never the cached
+        # snapshot: rows deleted or re-sorted in the sheet shift them
+        cols = self._sheets.read_columns(self._title(table), [self._col(table, headers, c) for c in keys])
+        n = max(map(len, cols))
+        want = [_str(where[c]) for c in keys] if where else None
+        rows = [
+            r for r in range(1, n)
+            if want is None or all((col[r] if r < len(col) else "") == w for col, w in zip(cols, want))
+        ]
+        with self.batch() as pending:
+            cells = pending.cells.setdefault(table, {})
+            for r in rows:
+                for c in set_cols:
+                    cells[(r + 1, self._col(table, headers, c))] = _str(values[c])
+        return len(rows)
+
+    # -------------------------------------------------------------- #
+    def _pending(self) -> _WriteBatch | None:
+        return getattr(self._local, "batch", None)
+
+    @contextmanager
+    def batch(self):
+        """
+        Coalesce every write made inside the block into one append_rows and
+        one batch_update call per worksheet, sent when the block exits.
+        """
+        pending = self._pending()
+        if pending is not None:               # nested: the outer block flushes
+            yield pending
+            return
+        pending = self._local.batch = _WriteBatch()
+        try:
+            yield pending
+        finally:
+            self._local.batch = None
+        self._flush(pending)
+
+    def _flush(self, pending: _WriteBatch) -> None:
+        for table, rows in pending.appends.items():
+            self._worksheet(table)
+            headers = self._headers(table)
+            order = headers + [c for c in SCHEMA[table] if c not in headers]
+            self._sheets.append_rows(
+                self._title(table), [[_str(r.get(c)) for c in order] for r in rows]
+            )
+        for table, cells in pending.cells.items():
+            self._sheets.batch_update(self._title(table), cells)
+
+# ------------------------------------------------------------------ #
+# 5) Mirrored writes (SQLite primary, Sheets as sync target)
+# ------------------------------------------------------------------ #
+class SyncedRepository(Repository):
+    """Reads from `primary`; writes go to `primary` then best-effort to `mirror`."""
+
+    def __init__(self, primary: Repository, mirror: Repository):
+        self.primary = primary
+        self.mirror = mirror
+
+    def all(self, table: str) -> pd.DataFrame:
+        return self.primary.all(table)
+
+    def find(self, table: str, **where) -> pd.DataFrame:
+        return self.primary.find(table, **where)
+
+    def count(self, table: str) -> int:
+        return self.primary.count(table)
+
+    def snapshot_version(self, table: str):
+        return self.primary.snapshot_version(table)
+
+    def insert_many(self, table: str, rows: list[dict]) -> None:
+        self.primary.insert_many(table, rows)
+        try:
+            self.mirror.insert_many(table, rows)
+        except Exception:
+            log.exception("Sheets sync failed for insert into %s", table)
+
+    @contextmanager
+    def batch(self):
+        mirror = self.mirror.batch()
+        mirror.__enter__()
+        try:
+            yield
+        except BaseException:
+            mirror.__exit__(*sys.exc_info())
+            raise
+        try:
+            mirror.__exit__(None, None, None)
+        except Exception:
+            log.exception("Sheets sync failed for batched writes")
+
+    def update(self, table: str, where: dict, values: dict) -> int:
+        n = self.primary.update(table, where, values)
+        try:
+            self.mirror.update(table, where, values)
+        except Exception:
+            log.exception("Sheets sync failed for update of %s", table)
+        return n
+
+
+def copy_tables(src: Repository, dst: SQLiteRepository, tables=None) -> dict[str, int]:
+    """Replace each table of `dst` with the rows of `src` (e.g. seed SQLite from Sheets)."""
+    counts = {}
+    for table in tables or SHEET_NAMES:
+        df = src.all(table)
+        rows = df.reindex(columns=SCHEMA[table], fill_value="").to_dict("records")
+        dst.replace(table, {}, rows)
+        counts[table] = len(rows)
+    return counts
+
+# ------------------------------------------------------------------ #
+# 6) Process-wide repository
+# ------------------------------------------------------------------ #
+_REPO: Repository | None = None
+_REPO_LOCK = threading.Lock()
+
+
+def get_repo() -> Repository:
+    """The configured repository, created once per process."""
+    global _REPO
+    with _REPO_LOCK:
+        if _REPO is None:
+            if BACKEND == "sheets":
+                _REPO = SheetsRepository()
+            elif BACKEND == "sqlite":
+                local = SQLiteRepository(DB_PATH)
+                _REPO = local
+                if SHEETS_SYNC:
+                    _REPO = SyncedRepository(local, SheetsRepository())
+                    if not any(local.count(t) for t in SHEET_NAMES):
+                        log.info("Seeding %s from Google Sheets: %s", DB_PATH,
+                                 copy_tables(_REPO.mirror, local))
+            else:
+                raise ValueError(f"Unknown FASTLABOR_STORAGE {BACKEND!r}")
+        return _REPO
+
+# ------------------------------------------------------------------ #
+# 7) User index (email -> password digest), kept warm per process
+# ------------------------------------------------------------------ #
+class UserIndex:
+    """
+    Hash index over the users table for login / password reset.
+
+    Only a keyed blake2b digest of each password is held, never the
+    password itself; the key is random per process.  On a backend that
+    serves snapshots (Sheets) the digest map decides: it is rebuilt once
+    each time the users snapshot changes (TTL expiry or a write, see
+    Repository.snapshot_version) and kept current with add() /
+    set_password() in between.  A live, indexed backend (SQLite) needs no
+    map: each check() reads the one row by email.
+    """
+
+    def __init__(self, repo: Repository):
+        self._repo = repo
+        self._key = os.urandom(32)
+        self._digests: dict[str, bytes] | None = None
+        self._version = None                  # snapshot the map was built from
+        self._lock = threading.Lock()
+        self._map()
+
+    def __len__(self) -> int:
+        digests = self._map()
+        return self._repo.count("users") if digests is None else len(digests)
+
+    def __contains__(self, email: str) -> bool:
+        return self._lookup(email) is not None
+
+    def _digest(self, password: str) -> bytes:
+        return hashlib.blake2b(_str(password).encode("utf-8"), key=self._key).digest()
+
+    def _map(self) -> dict[str, bytes] | None:
+        """The digest map for the current users snapshot; None on a live backend."""
+        version = self._repo.snapshot_version("users")
+        if version is None:
+            return None
+        with self._lock:
+            if self._digests is None or version != self._version:
+                users = self._repo.all("users")
+                digests: dict[str, bytes] = {}
+                if {"email", "password"} <= set(users.columns):
+                    for email, pw in zip(users["email"], users["password"]):
+                        digests.setdefault(email, self._digest(pw))   # first row wins, like repo.first
+                self._digests, self._version = digests, version
+            return self._digests
+
+    def add(self, row: dict) -> None:
+        """Index a newly registered user row."""
+        with self._lock:
+            if self._digests is not None:
+                self._digests.setdefault(_str(row.get("email")), self._digest(row.get("password")))
+
+    def set_password(self, email: str, password: str) -> None:
+        with self._lock:
+            if self._digests is not None:
+                self._digests[email] = self._digest(password)
+
+    def _lookup(self, email: str) -> bytes | None:
+        if not email:
+            return None
+        digests = self._map()
+        if digests is not None:
+            return digests.get(email)
+        row = self._repo.first("users", email=email)
+        return None if row is None else self._digest(row.get("password"))
+
+    def check(self, email: str, password: str) -> bool:
+        digest = self._lookup(email)
+        return digest is not None and hmac.compare_digest(digest, self._digest(password))
+
+
+_USER_INDEX: UserIndex | None = None
+
+
+def user_index() -> UserIndex:
+    """Process-wide UserIndex over get_repo(), built on first use."""
+    global _USER_INDEX
+    repo = get_repo()
+    with _REPO_LOCK:
+        if _USER_INDEX is None:
+            _USER_INDEX = UserIndex(repo)
+        return _USER_INDEX
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["import-sheets"]:
+        sys.exit("usage: python storage.py import-sheets")
+    for table, n in copy_tables(SheetsRepository(), SQLiteRepository(DB_PATH)).items():
+        print(f"{table}: {n} rows")
@@ -15,3 +15,7 @@ recs = matching.recommend(worker_row, jobs_df, n=5)
 # 4) แสดงค่า sim และ ai_score
 print("sim       :", recs["sim"].tolist())
 print("ai_score  :", recs["ai_score"].tolist())
+
+# 5) เรียก recommend_batch() กับแรงงานทุกคนในครั้งเดียว
+batch = matching.recommend_batch(seekers_df, jobs_df, n=5)
+print("batch     :", batch.groupby("worker_index").size().tolist())
@@ -0,0 +1,618 @@
+# test_units.py
+"""
+Unit tests for the matching internals and the stores (pytest; no model or
+network needed, see conftest.py).
+
+    python -m pytest -q
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import matching
+from embedding_store import EmbeddingStore
+from storage import (
+    SCHEMA, Repository, SheetsRepository, SQLiteRepository, SyncedRepository, UserIndex,
+)
+
+# ------------------------------------------------------------------ #
+# 1) Availability
+# ------------------------------------------------------------------ #
+NAN = np.nan
+
+
+def _avail(*rows):
+    """(day_from, day_to, win_start, win_end) arrays from row tuples."""
+    return tuple(np.array(col, dtype=float) for col in zip(*rows))
+
+
+def test_windows_overlap_overnight():
+    night = (0, 0, 22 * 60, 30 * 60)                  # 22:00 -> 06:00 next day
+    hit = matching._schedules_overlap(
+        _avail(night),
+        _avail((0, 0, 5 * 60, 7 * 60),                # early morning, after the wrap
+               (0, 0, 23 * 60, 23 * 60 + 30),         # same evening
+               (0, 0, 7 * 60, 21 * 60),               # day shift: between the two halves
+               (0, 0, 21 * 60, 22 * 60),              # ends as the night starts
+               (0, 0, 23 * 60, 25 * 60)),             # another overnight window
+    )
+    assert hit.tolist() == [True, True, False, False, True]
+
+
+def test_schedules_overlap_dates_and_unknown():
+    q = _avail((10, 12, 8 * 60, 17 * 60))
+    c = _avail((12, 20, 9 * 60, 10 * 60),             # shares day 12
+               (13, 20, 9 * 60, 10 * 60),             # starts after
+               (0, 9, 9 * 60, 10 * 60),               # ends before
+               (NAN, NAN, 9 * 60, 10 * 60),           # unknown dates
+               (10, 12, NAN, NAN))                    # unknown window
+    assert matching._schedules_overlap(q, c).tolist() == [True, False, False, False, False]
+
+
+def test_availability_index_matches_brute_force():
+    rng = np.random.default_rng(0)
+    n = 2000
+    d0 = rng.integers(0, 365, n).astype(float)
+    w0 = rng.integers(0, 1440, n).astype(float)
+    avail = (d0, d0 + rng.integers(0, 10, n), w0, w0 + rng.integers(30, 600, n))
+    index = matching.AvailabilityIndex()
+    index.add(np.arange(n), avail)
+    for _ in range(50):
+        day, start = float(rng.integers(0, 365)), float(rng.integers(0, 1440))
+        q = (day, day + 2, start, start + 120)
+        expected = np.flatnonzero(matching._schedules_overlap(q, avail))
+        assert np.array_equal(np.sort(index.overlapping(*q)), expected)
+
+
+def test_availability_index_unknown_dates_always_match():
+    index = matching.AvailabilityIndex()
+    index.add([1, 2, 3], _avail((5, 5, 60, 120), (NAN, NAN, 60, 120), (50, 50, 60, 120)))
+    assert sorted(index.overlapping(5, 5, 90, 100)) == [1, 2]
+    assert sorted(index.overlapping(100, 100, 90, 100)) == [2]
+
+    index.add([2], _avail((100, 100, 60, 120)))      # dates filled in later
+    assert sorted(index.overlapping(5, 5, 90, 100)) == [1]
+    index.remove([1, 2])
+    assert len(index) == 1 and index.overlapping(5, 5, 90, 100).size == 0
+
+
+def test_job_index_available(stub_encoder):
+    jobs = matching.encode_job_df(pd.DataFrame({
+        "job_id": ["PJ1", "PJ2", "PJ3", "PJ4"],
+        "job_type": "cleaning", "job_detail": "office", "salary": "500",
+        "job_date": ["2026-10-01 to 2026-10-05", "2026-10-10", "2026-10-02", ""],
+        "start_time": ["08:00", "08:00", "22:00", "08:00"],
+        "end_time": ["17:00", "17:00", "06:00", "17:00"],
+        "province": "", "district": "", "subdistrict": "",
+    }))
+    worker = matching.encode_worker_df(pd.DataFrame({
+        "findjob_id": ["FJ1"], "job_type": ["cleaning"], "skills": ["office"],
+        "start_salary": ["400"], "range_salary": ["600"],
+        "job_date": ["2026-10-02 to 2026-10-04"], "start_time": ["05:00"], "end_time": ["07:00"],
+        "province": [""], "district": [""], "subdistrict": [""],
+    }))
+    index = matching.JobIndex.from_df(jobs)
+    q = [float(a[0]) for a in matching._availability(worker)]
+    got = index.rows.loc[index.available(*q), "job_id"]
+    # PJ3's 22:00-06:00 window covers 05:00-06:00; PJ1 is a day shift; PJ4 has no date
+    assert sorted(got) == ["PJ3", "PJ4"]
+
+# ------------------------------------------------------------------ #
+# 2) _top_n
+# ------------------------------------------------------------------ #
+def test_top_n_ties_keep_candidate_order():
+    scores = np.array([[1.0, 2.0, 2.0, 0.0, 2.0],
+                       [3.0, 3.0, 3.0, 3.0, 3.0]])
+    assert matching._top_n(scores.copy(), 2).tolist() == [[1, 2], [0, 1]]
+    assert matching._top_n(scores.copy(), 4).tolist() == [[1, 2, 4, 0], [0, 1, 2, 3]]
+
+
+def test_top_n_dedupe_keeps_best_per_key():
+    scores = np.array([[0.9, 0.8, 0.95, 0.1, 0.85]])
+    keys = np.array([["a", "b", "a", "c", "b"]], dtype=object)
+    out = matching._top_n(scores.copy(), 3, keys)
+    assert out.tolist() == [[2, 4, 3]]
+
+    # more slots than distinct keys: the rest point at -inf scores
+    s = scores.copy()
+    out = matching._top_n(s, 5, keys)
+    assert out[0, :3].tolist() == [2, 4, 3]
+    assert np.isneginf(np.take_along_axis(s, out, axis=1)[0, 3:]).all()
+
+
+def test_top_n_dedupe_missing_keys():
+    # NaN / None keys (CSV-loaded frames) group per row like any other value
+    scores = np.array([[0.9, 0.8, 0.7], [0.6, 0.5, 0.4]])
+    out = matching._top_n(scores.copy(), 3, np.full((2, 3), None, dtype=object))
+    assert out[:, 0].tolist() == [0, 0]
+    keys = np.array([[np.nan, "a", np.nan], ["a", np.nan, "b"]], dtype=object)
+    s = scores.copy()
+    out = matching._top_n(s, 3, keys)
+    assert out[:, :2].tolist() == [[0, 1], [0, 1]] and out[1, 2] == 2
+    assert np.isneginf(s[0, 2]) and np.isfinite(s[1]).all()
+
+
+@pytest.mark.parametrize("n, width", [(0, 0), (-1, 0), (9, 5)])
+def test_top_n_sizes(n, width):
+    assert matching._top_n(np.random.default_rng(0).random((3, 5)), n).shape == (3, width)
+    assert matching._top_n(np.empty((2, 0)), n).shape == (2, 0)
+
+# ------------------------------------------------------------------ #
+# 3) EmbeddingStore
+# ------------------------------------------------------------------ #
+class _Counting:
+    def __init__(self, encode):
+        self.encode, self.calls = encode, []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return self.encode(texts)
+
+
+def test_embedding_store_reload(tmp_path, stub_encoder):
+    texts = ["cleaning office", "driver van", "cleaning office", "cook thai"]
+    first = _Counting(stub_encoder)
+    vecs = EmbeddingStore("stub", root=tmp_path).encode(texts, first)
+    assert [sorted(c) for c in first.calls] == [["cleaning office", "cook thai", "driver van"]]
+    np.testing.assert_array_equal(vecs, stub_encoder(texts))
+
+    again = _Counting(stub_encoder)
+    store = EmbeddingStore("stub", root=tmp_path)
+    assert len(store) == 3 and "driver van" in store
+    np.testing.assert_array_equal(store.encode(texts, again), vecs)
+    assert again.calls == []
+
+
+def test_embedding_store_sees_other_instances(tmp_path, stub_encoder):
+    a, b = EmbeddingStore("stub", root=tmp_path), EmbeddingStore("stub", root=tmp_path)
+    a.encode(["x"], stub_encoder)
+    b.encode(["y"], stub_encoder)
+    fn = _Counting(stub_encoder)
+    np.testing.assert_array_equal(a.encode(["y", "x"], fn), stub_encoder(["y", "x"]))
+    assert fn.calls == []
+
+
+@pytest.mark.parametrize("torn", ["vecs", "keys"])
+def test_embedding_store_trims_torn_write(tmp_path, stub_encoder, torn):
+    store = EmbeddingStore("stub", root=tmp_path)
+    store.encode(["a", "b"], stub_encoder)
+    if torn == "vecs":                                  # half a row flushed, no key
+        with open(store._vec_path, "ab") as fh:
+            fh.write(b"\0" * (store.dim * 2))
+    else:                                               # key flushed, no vector
+        with open(store._key_path, "a") as fh:
+            fh.write("0" * 40 + "\n" + "1" * 17)
+
+    fn = _Counting(stub_encoder)
+    reopened = EmbeddingStore("stub", root=tmp_path)
+    assert len(reopened) == 2
+    assert reopened._vec_path.stat().st_size == 2 * store.dim * 4
+    np.testing.assert_array_equal(reopened.encode(["b", "c", "a"], fn), stub_encoder(["b", "c", "a"]))
+    assert fn.calls == [["c"]]
+    assert len(EmbeddingStore("stub", root=tmp_path)) == 3
+
+# ------------------------------------------------------------------ #
+# 4) UserIndex
+# ------------------------------------------------------------------ #
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(tmp_path / "users.db")
+    repo.insert("users", {"email": "a@x", "password": "old"})
+    return repo
+
+
+def test_user_index_check(repo):
+    users = UserIndex(repo)
+    assert len(users) == 1 and "a@x" in users
+    assert users.check("a@x", "old")
+    assert not users.check("a@x", "wrong")
+    assert not users.check("nobody@x", "old")
+    assert not users.check("", "")
+
+
+def test_user_index_follows_the_repository(repo):
+    users = UserIndex(repo)
+    # registered / reset through another process: only the repository changed
+    repo.insert("users", {"email": "b@x", "password": "pw"})
+    repo.update("users", {"email": "a@x"}, {"password": "new"})
+    assert "b@x" in users and users.check("b@x", "pw")
+    assert users.check("a@x", "new")
+    assert not users.check("a@x", "old")
+
+
+class _SnapshotRepo(SQLiteRepository):
+    """A repository serving snapshots, like SheetsRepository: `version` is bumped by hand."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.version, self.reads = 0, 0
+
+    def snapshot_version(self, table):
+        return self.version
+
+    def all(self, table):
+        self.reads += 1
+        return super().all(table)
+
+
+def test_user_index_map_rebuilt_once_per_snapshot(tmp_path):
+    repo = _SnapshotRepo(tmp_path / "users.db")
+    repo.insert("users", {"email": "a@x", "password": "old"})
+    users = UserIndex(repo)
+    for _ in range(3):
+        assert users.check("a@x", "old") and not users.check("a@x", "new")
+    assert repo.reads == 1
+
+    # a reset seen through this process: the map is updated in place
+    repo.update("users", {"email": "a@x"}, {"password": "new"})
+    users.set_password("a@x", "new")
+    users.add({"email": "b@x", "password": "pw"})
+    assert users.check("a@x", "new") and users.check("b@x", "pw") and len(users) == 2
+    assert repo.reads == 1
+
+    # changed elsewhere: visible once the snapshot changes, after one rebuild
+    repo.update("users", {"email": "a@x"}, {"password": "newer"})
+    assert users.check("a@x", "new")
+    repo.version += 1
+    assert users.check("a@x", "newer") and not users.check("b@x", "pw")
+    assert users.check("a@x", "newer") and repo.reads == 2
+
+# ------------------------------------------------------------------ #
+# 5) Materializer
+# ------------------------------------------------------------------ #
+POST = {"job_id": "PJ1", "email": "boss@x", "job_type": "cleaning", "job_detail": "office",
+        "salary": "500", "job_date": "2026-10-01", "start_time": "08:00", "end_time": "17:00"}
+SEARCH = {"findjob_id": "FJ1", "email": "w@x", "job_type": "cleaning", "skills": "office",
+          "start_salary": "400", "range_salary": "600", "job_date": "2026-10-01",
+          "start_time": "08:00", "end_time": "17:00"}
+
+
+@pytest.fixture
+def recs(tmp_path, monkeypatch, stub_encoder):
+    from recommendations import Materializer
+
+    monkeypatch.setattr(matching, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(matching, "_SHARED_INDEXES", {})
+    repo = SQLiteRepository(tmp_path / "app.db")
+    return Materializer(repo, repo)
+
+
+def test_materializer_refresh_empty_tables(recs):
+    recs.refresh()                                      # fresh DB: no posts, no searches
+    assert recs.store.all("recommendations").empty
+    recs.repo.insert("post_job", POST)
+    recs.refresh()                                      # posts but no searches yet
+    assert recs.top("post_job", "PJ1").empty
+
+
+def test_materializer_refresh_ranks_both_sides(recs):
+    recs.repo.insert("post_job", POST)
+    recs.repo.insert("find_job", SEARCH)
+    recs.refresh()
+    assert recs.top("post_job", "PJ1")["target_id"].tolist() == ["FJ1"]
+    assert recs.top("find_job", "FJ1")["target_id"].tolist() == ["PJ1"]
+
+
+def test_materializer_top_never_refreshes_inline(recs, monkeypatch):
+    recs.repo.insert("post_job", POST)
+    recs.repo.insert("find_job", SEARCH)
+    monkeypatch.setattr(recs, "refresh", lambda: pytest.fail("full pass inside a request"))
+    assert recs.warming_up and recs.top("post_job", "PJ1").empty   # cold: served as is
+    # the jobs index as a previous process left it on disk
+    matching.shared_index("post_job", id_col="job_id", partitioned=True).sync(
+        matching.encode_job_df(recs.repo.all("post_job"))
+    )
+    recs.notify("find_job", "FJ1")                      # notified: that one row is ranked
+    assert recs.top("find_job", "FJ1")["target_id"].tolist() == ["PJ1"]
+    assert recs.top("post_job", "PJ1").empty
+
+
+def test_materializer_notify_reranks_one_source(recs, monkeypatch):
+    recs.repo.insert("post_job", POST)
+    recs.repo.insert("find_job", SEARCH)
+    recs.refresh()
+    assert not recs.warming_up
+    monkeypatch.setattr(recs, "refresh", lambda: pytest.fail("full pass inside a request"))
+    recs.repo.insert("post_job", dict(POST, job_id="PJ2", salary="900"))
+    matching.shared_index("post_job", id_col="job_id", partitioned=True).upsert(
+        matching.encode_job_df(recs.repo.all("post_job"))
+    )
+    assert recs.top("find_job", "FJ1")["target_id"].tolist() == ["PJ1"]    # not notified
+    recs.notify("find_job", "FJ1")
+    assert sorted(recs.top("find_job", "FJ1")["target_id"]) == ["PJ1", "PJ2"]
+
+# ------------------------------------------------------------------ #
+# 6) JobIndex: updates and persistence
+# ------------------------------------------------------------------ #
+def _posts(ids, job_type="cleaning", detail="office"):
+    n = len(ids)
+    return matching.encode_job_df(pd.DataFrame({
+        "job_id": list(ids), "job_type": job_type, "job_detail": [f"{detail} {i}" for i in ids],
+        "salary": "500", "job_date": "2026-10-01", "start_time": "08:00", "end_time": "17:00",
+        "province": [""] * n, "district": "", "subdistrict": "",
+    }))
+
+
+def _ids(index) -> list[str]:
+    return sorted(index.rows["job_id"])
+
+
+def test_job_index_sync_skips_unchanged_rows(stub_encoder, monkeypatch):
+    index = matching.JobIndex()
+    index.sync(_posts([f"PJ{i}" for i in range(10)]))
+    upserted = []
+    upsert = index.upsert
+    monkeypatch.setattr(index, "upsert", lambda df: (upserted.append(len(df)), upsert(df)))
+    index.sync(_posts([f"PJ{i}" for i in range(2, 12)]))
+    assert upserted == [2] and _ids(index) == sorted(f"PJ{i}" for i in range(2, 12))
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf", "hnsw"])
+def test_job_index_upsert_remove_sync(stub_encoder, kind):
+    index = matching.JobIndex(kind=kind)
+    index.upsert(_posts([f"PJ{i}" for i in range(40)]))
+    assert len(index) == 40 and index._index.ntotal == 40
+
+    index.upsert(_posts(["PJ1", "PJ2"], detail="night shift"))          # edited: replaced
+    assert len(index) == 40 and index._index.ntotal == 40
+    assert index.rows.set_index("job_id").loc["PJ1", "job_detail"] == "night shift PJ1"
+    top = index.search(_posts(["PJ1"], detail="night shift")["vec"][0], 1)
+    assert top["job_id"].tolist() == ["PJ1"] and top["sim"][0] == pytest.approx(1, abs=1e-3)
+
+    index.remove(["PJ0", "PJ3", "nope"])
+    assert len(index) == 38 and "PJ0" not in set(index.search(_posts(["PJ0"])["vec"][0], 38)["job_id"])
+
+    index.sync(_posts([f"PJ{i}" for i in range(30, 45)]))
+    assert _ids(index) == sorted(f"PJ{i}" for i in range(30, 45))
+    assert index._index.ntotal == 15
+
+    index.upsert(_posts([f"PJ{i}" for i in range(30, 45)], detail="all"))   # replaces every row
+    assert len(index) == 15 and index._index.ntotal == 15
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf"])
+def test_job_index_save_load_round_trip(tmp_path, stub_encoder, kind):
+    path = tmp_path / "jobs.faiss"
+    index = matching.JobIndex(kind=kind, path=path)
+    saves = []
+    save = index.save
+    index.save = lambda p: (saves.append(p), save(p))
+    index.upsert(_posts([f"PJ{i}" for i in range(20)]))
+    index.upsert(_posts(["PJ1"], detail="edited"))                     # replace: one save
+    index.sync(_posts([f"PJ{i}" for i in range(10)]))
+    assert len(saves) == 3
+    assert not list(tmp_path.glob("*.tmp"))
+
+    loaded = matching.JobIndex.load(path)
+    assert loaded.kind == kind and _ids(loaded) == _ids(index)
+    q = _posts(["PJ1"], detail="edited")["vec"][0]
+    assert loaded.search(q, 3)["job_id"].tolist() == index.search(q, 3)["job_id"].tolist()
+    loaded.upsert(_posts(["PJ99"]))                                     # ids continue after reload
+    assert len(loaded) == 11 and loaded._index.ntotal == 11
+
+
+def test_job_index_load_rejects_mixed_saves(tmp_path, stub_encoder, monkeypatch):
+    path = tmp_path / "jobs.faiss"
+    index = matching.JobIndex(path=path)
+    index.upsert(_posts(["PJ1", "PJ2"]))
+    old_rows = path.with_suffix(".rows.pkl").read_bytes()
+    index.upsert(_posts(["PJ3"]))
+    path.with_suffix(".rows.pkl").write_bytes(old_rows)                # torn: rows from the save before
+    with pytest.raises(ValueError):
+        matching.JobIndex.load(path)
+
+    # the shared index starts over instead of failing every request
+    monkeypatch.setattr(matching, "INDEX_DIR", tmp_path)
+    monkeypatch.setattr(matching, "_SHARED_INDEXES", {})
+    shared = matching.shared_index("jobs")
+    assert len(shared) == 0
+    shared.sync(_posts(["PJ1", "PJ2", "PJ3"]))
+    assert _ids(matching.JobIndex.load(path)) == ["PJ1", "PJ2", "PJ3"]
+
+# ------------------------------------------------------------------ #
+# 7) PartitionedIndex
+# ------------------------------------------------------------------ #
+def _searches(types):
+    n = len(types)
+    return matching.encode_worker_df(pd.DataFrame({
+        "findjob_id": [f"FJ{i}" for i in range(n)], "job_type": types, "skills": "office",
+        "start_salary": "400", "range_salary": "600", "job_date": "2026-10-01",
+        "start_time": "08:00", "end_time": "17:00", "province": "", "district": "", "subdistrict": "",
+    }))
+
+
+def test_partitioned_recommend_batch_keeps_worker_order(stub_encoder):
+    index = matching.PartitionedIndex()
+    index.upsert(pd.concat([_posts(["PJ1", "PJ2"], "cleaning"), _posts(["PJ3"], "driver")],
+                           ignore_index=True))
+    workers = _searches(["driver", "cleaning", "driver", "cleaning"]).set_axis([10, 11, 12, 13])
+    out = matching.recommend_batch(workers, index=index, n=2)
+    assert out["worker_index"].tolist() == [10, 11, 11, 12, 13, 13]
+    assert out.groupby("worker_index")["rank"].apply(list).tolist() == [[1], [1, 2], [1], [1, 2]]
+    assert set(out.loc[out["worker_index"] == 12, "job_id"]) == {"PJ3"}
+
+
+def _shard_ids(index) -> dict[str, list[str]]:
+    return {key: _ids(shard) for key, shard in sorted(index._shards.items())}
+
+
+def test_partitioned_row_moves_between_shards(stub_encoder):
+    index = matching.PartitionedIndex(by_province=True)
+    index.upsert(pd.concat([_posts(["PJ1", "PJ2"], "Cleaning"), _posts(["PJ3"], "driver")],
+                           ignore_index=True))
+    assert _shard_ids(index) == {"cleaning|": ["PJ1", "PJ2"], "driver|": ["PJ3"]}
+
+    index.upsert(_posts(["PJ2"], " DRIVER "))                          # edited job type
+    assert _shard_ids(index) == {"cleaning|": ["PJ1"], "driver|": ["PJ2", "PJ3"]}
+
+    index.sync(_posts(["PJ1", "PJ3"], "driver"))                       # PJ2 gone, PJ1 moved
+    assert _shard_ids(index) == {"driver|": ["PJ1", "PJ3"]}           # empty shard dropped
+    assert len(index) == 2
+
+
+def test_partitioned_save_load(tmp_path, stub_encoder):
+    index = matching.PartitionedIndex(path=tmp_path, kind="flat")
+    index.sync(pd.concat([_posts(["PJ1", "PJ2"], "cleaning"), _posts(["PJ3"], "driver")],
+                         ignore_index=True))
+    saves = []
+    for shard in index._shards.values():
+        save = shard.save
+        shard.save = lambda p, save=save: (saves.append(p.name), save(p))
+    index.upsert(_posts(["PJ1"], "driver"))                            # touches both shards once
+    assert sorted(saves) == sorted(s.path.name for s in index._shards.values())
+
+    loaded = matching.PartitionedIndex.load(tmp_path)
+    assert _shard_ids(loaded) == _shard_ids(index) == {"cleaning": ["PJ2"], "driver": ["PJ1", "PJ3"]}
+    assert loaded._params == {"kind": "flat"} and loaded.id_col == "job_id"
+    workers = _searches(["driver"])
+    assert matching.recommend_batch(workers, index=loaded, n=5)["job_id"].tolist() == \
+        matching.recommend_batch(workers, index=index, n=5)["job_id"].tolist()
+
+# ------------------------------------------------------------------ #
+# 8) Repositories
+# ------------------------------------------------------------------ #
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        Repository()
+
+
+def test_sqlite_repository_crud(tmp_path):
+    repo = SQLiteRepository(tmp_path / "app.db")
+    repo.insert_many("post_job", [
+        {"job_id": "PJ1", "email": "a@x", "salary": 500, "not_a_column": "ignored"},
+        {"job_id": "PJ2", "email": "b@x", "salary": None},
+        {"job_id": "PJ3", "email": "a@x"},
+    ])
+    assert repo.count("post_job") == 3
+    mine = repo.find("post_job", email="a@x")
+    assert mine["job_id"].tolist() == ["PJ1", "PJ3"] and list(mine.columns) == SCHEMA["post_job"]
+    assert repo.first("post_job", job_id="PJ1")["salary"] == "500"      # values are strings
+    assert repo.first("post_job", job_id="PJ2")["salary"] == ""
+    assert repo.first("post_job", job_id="nope") is None
+    with pytest.raises(KeyError):
+        repo.find("post_job", no_such_column="x")
+
+    assert repo.update("post_job", {"email": "a@x"}, {"salary": 600}) == 2
+    assert repo.find("post_job", salary="600")["job_id"].tolist() == ["PJ1", "PJ3"]
+    assert repo.update("post_job", {"job_id": "nope"}, {"salary": 1}) == 0
+
+    repo.replace("post_job", {"email": "a@x"}, [{"job_id": "PJ4", "email": "a@x"}])
+    assert repo.all("post_job")["job_id"].tolist() == ["PJ2", "PJ4"]
+    repo.replace("post_job", {}, [])
+    assert repo.count("post_job") == 0
+
+
+def test_sqlite_repository_adds_new_schema_columns(tmp_path):
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as con:                  # a file from before "gender" existed
+        con.execute('CREATE TABLE "post_job" ("job_id" TEXT, "email" TEXT)')
+        con.execute("INSERT INTO post_job VALUES ('PJ1', 'a@x')")
+    repo = SQLiteRepository(path)
+    row = repo.first("post_job", job_id="PJ1")
+    assert row["email"] == "a@x" and row["gender"] == "" and row["province"] == ""
+    repo.update("post_job", {"job_id": "PJ1"}, {"gender": "F"})
+    assert repo.first("post_job", gender="F")["job_id"] == "PJ1"
+
+
+class _FakeSheets:
+    """Stand-in for the sheets module: `live` is the spreadsheet, `snapshot` the cached copy."""
+
+    def __init__(self, tables: dict[str, list[list[str]]]):
+        self.live = {name: [list(r) for r in rows] for name, rows in tables.items()}
+        self.snapshot = {name: [list(r) for r in rows] for name, rows in tables.items()}
+        self.calls: list[tuple] = []
+
+    def worksheet(self, name):
+        return name
+
+    def invalidate(self, name):
+        self.snapshot[name] = [list(r) for r in self.live[name]]
+
+    def version(self, name):
+        return 0
+
+    def read_values(self, name, fresh=False):
+        return self.snapshot[name]
+
+    def read_df(self, name):
+        vals = self.read_values(name)
+        return pd.DataFrame(vals[1:], columns=vals[0])
+
+    def row_count(self, name):
+        return len(self.live[name])
+
+    def read_columns(self, name, cols):
+        self.calls.append(("read_columns", name))
+        return [[row[c - 1] for row in self.live[name]] for c in cols]
+
+    def append_rows(self, name, rows):
+        self.calls.append(("append_rows", name, len(rows)))
+        self.live[name].extend(rows)
+        self.invalidate(name)
+
+    def batch_update(self, name, cells):
+        self.calls.append(("batch_update", name, dict(cells)))
+        for (r, c), v in cells.items():
+            self.live[name][r - 1][c - 1] = v
+        self.invalidate(name)
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    import sys
+
+    fake = _FakeSheets({
+        "post_job": [["job_id", "email", "salary"], ["PJ1", "a@x", "500"], ["PJ2", "b@x", "500"]],
+        "sheet1": [["email", "password"]],
+    })
+    monkeypatch.setitem(sys.modules, "sheets", fake)
+    return fake
+
+
+def test_sheets_repository_one_call_per_kind_per_action(sheets):
+    repo = SheetsRepository()
+    with repo.batch():
+        repo.insert("post_job", {"job_id": "PJ3", "email": "c@x", "gender": "F"})
+        repo.insert("post_job", {"job_id": "PJ4", "email": "c@x"})
+        assert repo.count("post_job") == 4                             # queued rows counted
+        repo.update("post_job", {"email": "a@x"}, {"salary": "600"})
+        repo.update("post_job", {"job_id": "PJ2"}, {"salary": "700", "email": "b2@x"})
+    writes = [c for c in sheets.calls if c[0] != "read_columns"]
+    assert writes == [
+        ("append_rows", "post_job", 2),
+        ("batch_update", "post_job", {(2, 3): "600", (3, 3): "700", (3, 2): "b2@x"}),
+    ]
+    # worksheet column order, then SCHEMA columns it does not have yet
+    assert sheets.live["post_job"][3][:4] == ["PJ3", "c@x", "", ""]
+    assert "F" in sheets.live["post_job"][3]
+
+
+def test_sheets_repository_update_reads_rows_fresh(sheets):
+    repo = SheetsRepository()
+    # PJ1 deleted by hand; the cached snapshot still has it
+    del sheets.live["post_job"][1]
+    assert repo.update("post_job", {"job_id": "PJ2"}, {"salary": "900"}) == 1
+    assert sheets.live["post_job"] == [["job_id", "email", "salary"], ["PJ2", "b@x", "900"]]
+    assert repo.update("post_job", {"job_id": "PJ1"}, {"salary": "1"}) == 0
+
+
+def test_synced_repository_batch(sheets, tmp_path, caplog):
+    local = SQLiteRepository(tmp_path / "app.db")
+    repo = SyncedRepository(local, SheetsRepository())
+    with repo.batch():
+        repo.insert("post_job", {"job_id": "PJ3", "email": "c@x"})
+        assert local.count("post_job") == 1 and sheets.calls == []     # mirror waits for the block
+        repo.update("post_job", {"job_id": "PJ2"}, {"salary": "700"})
+    assert [c[0] for c in sheets.calls if c[0] != "read_columns"] == ["append_rows", "batch_update"]
+
+    def fail(*a):
+        raise RuntimeError("quota")
+
+    sheets.append_rows = fail
+    with repo.batch():                                                 # mirror errors are logged
+        repo.insert("post_job", {"job_id": "PJ4"})
+    assert local.find("post_job", job_id="PJ4")["job_id"].tolist() == ["PJ4"]
+    assert "Sheets sync failed" in caplog.text
@@ -0,0 +1,218 @@
+# timing.py
+"""
+Opt-in per-stage timing and profiling for the matching pipeline.
+
+    import timing
+    with timing.stage("search", rows=len(queries)) as s:
+        ...
+        s["candidates"] = n_hits                 # any extra counts
+
+Stages nest ("recommend_batch/search") and are off unless FASTLABOR_TIMING
+is set (or timing.enable() is called):
+  • "1"   -> aggregate per stage; read with metrics_text() (Prometheus
+             text format) or write_metrics(path) for a textfile collector
+  • "log" -> also log every finished stage as one JSON line
+             (logger "fastlabor.timing", INFO)
+add_listener(fn) receives each finished stage as a dict.
+
+Profiling: `with timing.profiled("recommend"):` captures the block with
+cProfile (or pyinstrument, FASTLABOR_PROFILER=pyinstrument) when that
+name is listed in FASTLABOR_PROFILE (comma-separated, "*" for all) or
+force=True, and writes it under PROFILE_DIR.  A profiled block inside
+another one is covered by the outer profile.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+log = logging.getLogger("fastlabor.timing")
+
+# ------------------------------------------------------------------ #
+# 1) Config
+# ------------------------------------------------------------------ #
+_MODE       = os.environ.get("FASTLABOR_TIMING", "0")                  # "0" | "1" | "log"
+PROFILE     = {p for p in os.environ.get("FASTLABOR_PROFILE", "").split(",") if p}
+PROFILER    = os.environ.get("FASTLABOR_PROFILER", "cprofile")         # "cprofile" | "pyinstrument"
+PROFILE_DIR = Path(os.environ.get("FASTLABOR_PROFILE_DIR", Path(__file__).parent / ".profiles"))
+
+_enabled = _MODE != "0"
+_log_each = _MODE == "log"
+_profiling = threading.Lock()                      # held while a profiler runs (one per process)
+
+
+def enable(log_each: bool = False) -> None:
+    global _enabled, _log_each
+    _enabled, _log_each = True, log_each
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+# ------------------------------------------------------------------ #
+# 2) Stages
+# ------------------------------------------------------------------ #
+_COUNTERS = ("rows", "candidates")
+
+_totals: dict[str, dict[str, float]] = {}          # stage path -> calls / seconds / counters
+_totals_lock = threading.Lock()
+_listeners: list[Callable[[dict], None]] = []
+_local = threading.local()                         # per-thread stack of open stage names
+
+
+def add_listener(fn: Callable[[dict], None]) -> None:
+    _listeners.append(fn)
+
+
+def remove_listener(fn: Callable[[dict], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+class _Stage:
+    def __init__(self, name: str, counts: dict):
+        self.name = name
+        self.record = dict(counts)
+
+    def __enter__(self) -> dict:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+        self.record["stage"] = "/".join(stack)
+        self._t0 = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.record["seconds"] = time.perf_counter() - self._t0
+        _local.stack.pop()
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        _finish(self.record)
+
+
+class _NoStage:
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+def stage(name: str, **counts) -> _Stage | _NoStage:
+    """Context manager timing one stage; yields a dict for extra counts."""
+    return _Stage(name, counts) if _enabled else _NoStage()
+
+
+def _finish(record: dict) -> None:
+    with _totals_lock:
+        t = _totals.setdefault(record["stage"], {"calls": 0, "seconds": 0.0, "errors": 0,
+                                                 **{c: 0 for c in _COUNTERS}})
+        t["calls"] += 1
+        t["seconds"] += record["seconds"]
+        t["errors"] += "error" in record
+        for c in _COUNTERS:
+            t[c] += record.get(c) or 0
+    if _log_each:
+        log.info(json.dumps(record, default=str, ensure_ascii=False))
+    for fn in list(_listeners):
+        try:
+            fn(record)
+        except Exception:
+            log.exception("timing listener failed")
+
+
+def totals() -> dict[str, dict[str, float]]:
+    """Aggregates per stage path since start (or reset())."""
+    with _totals_lock:
+        return {k: dict(v) for k, v in _totals.items()}
+
+
+def reset() -> None:
+    with _totals_lock:
+        _totals.clear()
+
+# ------------------------------------------------------------------ #
+# 3) Prometheus text exposition
+# ------------------------------------------------------------------ #
+_METRICS = [
+    ("calls",      "fastlabor_stage_calls_total",      "Finished stage runs."),
+    ("seconds",    "fastlabor_stage_seconds_total",    "Wall time spent in the stage."),
+    ("errors",     "fastlabor_stage_errors_total",     "Stage runs that raised."),
+    ("rows",       "fastlabor_stage_rows_total",       "Input rows processed by the stage."),
+    ("candidates", "fastlabor_stage_candidates_total", "Candidates produced by the stage."),
+]
+
+
+def metrics_text() -> str:
+    snap = totals()
+    lines = []
+    for key, metric, help_text in _METRICS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for path, t in sorted(snap.items()):
+            label = path.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric}{{stage="{label}"}} {t[key]:g}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str | Path) -> None:
+    """metrics_text() to `path`, replaced atomically (node_exporter textfile collector)."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(metrics_text())
+    tmp.replace(path)
+
+# ------------------------------------------------------------------ #
+# 4) Profiling
+# ------------------------------------------------------------------ #
+@contextmanager
+def profiled(name: str, force: bool = False):
+    """Profile the block when `name` is in FASTLABOR_PROFILE (or "*" is), or with force=True."""
+    if not (force or name in PROFILE or "*" in PROFILE) or not _profiling.acquire(blocking=False):
+        yield None
+        return
+    try:
+        with _profile(name) as prof:
+            yield prof
+    finally:
+        _profiling.release()
+
+
+@contextmanager
+def _profile(name: str):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000:06d}"
+    if PROFILER == "pyinstrument":
+        from pyinstrument import Profiler
+        prof = Profiler()
+        prof.start()
+        try:
+            yield prof
+        finally:
+            prof.stop()
+            out = PROFILE_DIR / f"{name}-{stamp}.html"
+            out.write_text(prof.output_html(), encoding="utf-8")
+            log.info("profile of %s written to %s", name, out)
+        return
+    import cProfile
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        out = PROFILE_DIR / f"{name}-{stamp}.prof"
+        prof.dump_stats(out)
+        log.info("profile of %s written to %s (open with python -m pstats)", name, out)
@@ -1,169 +1,218 @@
 # train_matching_model.py
 """
 Train LightGBM LambdaRank + Embedding Similarity
-Creates `matching.lgb` next to `matching.py` with 5 features:
+Creates `matching.lgb` next to `matching.py` with 6 features:
   1) sim          -> semantic cosine similarity
   2) diff_wage    -> absolute wage difference
   3) same_type    -> job_type match flag
-  4) time_overlap -> datetime overlap flag
+  4) time_overlap -> schedule overlap flag (date ranges x daily windows)
   5) loc_match    -> location match flag
+  6) dist_km      -> haversine distance between subdistrict centroids
+                     (NaN when unknown; LightGBM learns a missing branch)
+
+Features come from `matching.pair_features`, the same code that scores
+candidates at serving time, so training and serving cannot drift apart.
 
 Requires CSVs in the same folder:
   • post_job.csv
   • find_job.csv
   • history_matches.csv
+
+Usage:
+  python train_matching_model.py                  # everything in memory
+  python train_matching_model.py --chunked        # stream history_matches.csv;
+        features go to disk, then to a LightGBM binary Dataset (matching.bin),
+        so peak RAM does not grow with the history log
+  python train_matching_model.py --procs 0        # embed uncached rows on every
+        core (e.g. the first run after a model change)
 """
 
+import argparse
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import lightgbm as lgb
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
-from datetime import datetime, timedelta
+
+import matching
 
 # ------------------------------------------------------------------
 # 1) Paths & constants
 # ------------------------------------------------------------------
 ROOT = Path(__file__).parent
-MODEL_PATH = ROOT / "matching.lgb"
+MODEL_PATH   = ROOT / "matching.lgb"
+DATASET_PATH = ROOT / "matching.bin"
 
 POST_JOB_CSV      = ROOT / "post_job.csv"
 FIND_JOB_CSV      = ROOT / "find_job.csv"
 HISTORY_MATCH_CSV = ROOT / "history_matches.csv"
 
-EMBED_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
-
-# ------------------------------------------------------------------
-# 2) Load CSVs and convert date/time columns
-# ------------------------------------------------------------------
-for p in (POST_JOB_CSV, FIND_JOB_CSV, HISTORY_MATCH_CSV):
-    if not p.exists():
-        raise FileNotFoundError(f"File not found: {p}")
-
-print("🔄 Loading CSVs …")
-jobs    = pd.read_csv(POST_JOB_CSV)
-workers = pd.read_csv(FIND_JOB_CSV)
-hist    = pd.read_csv(HISTORY_MATCH_CSV)
-
-# Convert job_date to date and times to time objects
-jobs["job_date"]    = pd.to_datetime(jobs["job_date"], errors="coerce").dt.date
-workers["job_date"] = pd.to_datetime(workers["job_date"], errors="coerce").dt.date
-for df in (jobs, workers):
-    for col in ("start_time", "end_time"):
-        df[col] = (
-            pd.to_datetime(df[col], format="%H:%M:%S", errors="coerce").dt.time
-        )
-
-# ------------------------------------------------------------------
-# 3) Encode embeddings
-# ------------------------------------------------------------------
-print("🔄 Encoding embeddings…")
-embedder = SentenceTransformer(EMBED_MODEL_NAME)
-
-def embed_text(df: pd.DataFrame, cols: list[str], new_col: str) -> pd.DataFrame:
-    texts = df[cols].fillna("").agg(" ".join, axis=1).tolist()
-    vecs  = embedder.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    df[new_col] = list(vecs)
-    return df
-
-jobs    = embed_text(jobs,    ["job_type", "job_detail"], "v_job")
-workers = embed_text(workers, ["job_type", "skills"], "v_worker")
-
-# ------------------------------------------------------------------
-# 4) Merge tables: history → jobs → workers
-# ------------------------------------------------------------------
-print("🔄 Merging tables…")
-tmp  = hist.merge(jobs,    on="job_id",    how="inner", suffixes=("", "_job"))
-full = tmp.merge(workers,   on="worker_id", how="inner", suffixes=("", "_worker"))
-
-# ------------------------------------------------------------------
-# 5) Rename job columns to have _job suffix for datetime/location
-# ------------------------------------------------------------------
-full = full.rename(columns={
-    "job_date":    "job_date_job",
-    "start_time":  "start_time_job",
-    "end_time":    "end_time_job",
-    "province":    "province_job",
-    "district":    "district_job",
-    "subdistrict": "subdistrict_job"
-})
-
-# ------------------------------------------------------------------
-# 6) Validate required columns
-# ------------------------------------------------------------------
-REQ_COLS = [
-    "v_job", "v_worker",
-    "salary", "start_salary", "range_salary",
-    "job_type", "job_type_worker",
-    "job_date_job", "start_time_job", "end_time_job",
-    "job_date_worker", "start_time_worker", "end_time_worker",
-    "province_job", "district_job", "subdistrict_job",
-    "province_worker", "district_worker", "subdistrict_worker",
-]
-missing = [c for c in REQ_COLS if c not in full.columns]
-if missing:
-    raise KeyError(f"Missing columns after merge: {missing}")
-
-# ------------------------------------------------------------------
-# 7) Build feature matrix X, label y, and group sizes
-# ------------------------------------------------------------------
-print("🔄 Building feature matrix…")
-def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a_norm = a / (np.linalg.norm(a) + 1e-9)
-    b_norm = b / (np.linalg.norm(b) + 1e-9)
-    return float(a_norm @ b_norm)
-
-X_list, y_list, group_sizes = [], [], []
-current_q = None
-for row in tqdm(full.itertuples(index=False), total=len(full), desc="Rows"):
-    # 1) sim
-    sim = cosine(np.asarray(row.v_job), np.asarray(row.v_worker))
-    # 2) diff_wage
-    exp_wage = (row.start_salary + row.range_salary)/2 if row.range_salary > 0 else row.start_salary
-    diff_wage = abs(row.salary - exp_wage)
-    # 3) same_type
-    same_type = int(str(row.job_type_worker).strip().lower() == str(row.job_type).strip().lower())
-    # 4) time_overlap
-    jd = datetime.combine(row.job_date_job,    row.start_time_job)
-    je = datetime.combine(row.job_date_job,    row.end_time_job)
-    wd = datetime.combine(row.job_date_worker, row.start_time_worker)
-    we = datetime.combine(row.job_date_worker, row.end_time_worker)
-    overlap = max(timedelta(0), min(je, we) - max(jd, wd))
-    time_ov = int(overlap.total_seconds() > 0)
-    # 5) loc_match
-    loc_match = int(
-        (row.province_job, row.district_job, row.subdistrict_job) ==
-        (row.province_worker, row.district_worker, row.subdistrict_worker)
+N_ESTIMATORS  = 200
+LEARNING_RATE = 0.1
+
+REQ_JOB_COLS    = ["salary", "job_type", "start_dt", "end_dt",
+                   "province", "district", "subdistrict"]
+REQ_WORKER_COLS = ["start_salary", "range_salary", "job_type", "avail_start", "avail_end",
+                   "province", "district", "subdistrict"]
+
+# ------------------------------------------------------------------
+# 2) Load job / worker tables + embeddings (same text & cache as serving)
+# ------------------------------------------------------------------
+def load_tables() -> tuple[pd.DataFrame, pd.DataFrame]:
+    for p in (POST_JOB_CSV, FIND_JOB_CSV, HISTORY_MATCH_CSV):
+        if not p.exists():
+            raise FileNotFoundError(f"File not found: {p}")
+
+    print("🔄 Loading & encoding jobs / workers …")
+    jobs    = pd.read_csv(POST_JOB_CSV).drop_duplicates("job_id", keep="last")
+    workers = pd.read_csv(FIND_JOB_CSV).drop_duplicates("worker_id", keep="last")
+    jobs    = matching.encode_job_df(jobs).reset_index(drop=True)
+    workers = matching.encode_worker_df(workers).reset_index(drop=True)
+
+    missing = [f"job.{c}" for c in REQ_JOB_COLS if c not in jobs.columns] + \
+              [f"worker.{c}" for c in REQ_WORKER_COLS if c not in workers.columns]
+    if missing:
+        raise KeyError(f"Missing columns: {missing}")
+    return jobs, workers
+
+# ------------------------------------------------------------------
+# 3) History rows → feature matrix X, label y, group sizes
+# ------------------------------------------------------------------
+def feature_tables(jobs: pd.DataFrame,
+                   workers: pd.DataFrame) -> tuple[matching.CandidateStore, matching.CandidateStore]:
+    """
+    Unit vectors and feature columns of both tables, built once and shared
+    by every build_features() call; rows are indexed by job_id / worker_id.
+    """
+    stores = []
+    for df, id_col in ((jobs, "job_id"), (workers, "worker_id")):
+        store = matching.CandidateStore.from_df(df, dtype=np.float32)
+        store.rows = store.rows.set_index(pd.Index(df[id_col].to_numpy()), drop=False)
+        stores.append(store)
+    return stores[0], stores[1]
+
+
+def build_features(hist: pd.DataFrame,
+                   jobs: matching.CandidateStore,
+                   workers: matching.CandidateStore) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # inner join of history with jobs / workers (see feature_tables), keeping history order
+    job_pos    = jobs.rows.index.get_indexer(hist["job_id"])
+    worker_pos = workers.rows.index.get_indexer(hist["worker_id"])
+    found      = (job_pos >= 0) & (worker_pos >= 0)
+    hist, job_pos, worker_pos = hist[found], job_pos[found], worker_pos[found]
+
+    X = matching.pair_features(workers, jobs, worker_pos, job_pos)
+    y = hist["accepted"].to_numpy(dtype="float32")
+
+    # group sizes = lengths of consecutive runs of query_id
+    q = hist["query_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+    return X, y, np.diff(np.r_[starts, len(q)])
+
+
+def iter_query_chunks(path: Path, chunk_size: int):
+    """Stream a history CSV in chunks that never split a query_id group."""
+    carry = None
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        q = chunk["query_id"].to_numpy()
+        last_start = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])[-1]
+        carry = chunk.iloc[last_start:]
+        if last_start:
+            yield chunk.iloc[:last_start]
+    if carry is not None and not carry.empty:
+        yield carry
+
+# ------------------------------------------------------------------
+# 4) Train: in memory
+# ------------------------------------------------------------------
+def train_in_memory(jobs: pd.DataFrame, workers: pd.DataFrame) -> None:
+    print("🔄 Building feature matrix…")
+    X, y, group_sizes = build_features(pd.read_csv(HISTORY_MATCH_CSV), *feature_tables(jobs, workers))
+    if not len(X):
+        raise ValueError("No history rows matched post_job / find_job ids")
+
+    print("🔄 Training LightGBM LambdaRank model…")
+    ranker = lgb.LGBMRanker(
+        objective="lambdarank",
+        metric="ndcg",
+        n_estimators=N_ESTIMATORS,
+        learning_rate=LEARNING_RATE,
+        importance_type="gain",
     )
-
-    X_list.append([sim, diff_wage, same_type, time_ov, loc_match])
-    y_list.append(int(row.accepted))
-
-    # group by query_id
-    if row.query_id != current_q:
-        group_sizes.append(0)
-        current_q = row.query_id
-    group_sizes[-1] += 1
-
-X = np.asarray(X_list, dtype="float32")
-y = np.asarray(y_list, dtype="float32")
-
-# ------------------------------------------------------------------
-# 8) Train LightGBM LambdaRanker
-# ------------------------------------------------------------------
-print("🔄 Training LightGBM LambdaRank model…")
-ranker = lgb.LGBMRanker(
-    objective="lambdarank",
-    metric="ndcg",
-    n_estimators=200,
-    learning_rate=0.1,
-    importance_type="gain",
-)
-ranker.fit(X, y, group=group_sizes)
-
-# ------------------------------------------------------------------
-# 9) Save model
-# ------------------------------------------------------------------
-ranker.booster_.save_model(str(MODEL_PATH))
-print(f"✅ Saved model → {MODEL_PATH.resolve()}")
+    ranker.fit(X, y, group=group_sizes, feature_name=matching.FEATURES)
+    ranker.booster_.save_model(str(MODEL_PATH))
+
+# ------------------------------------------------------------------
+# 5) Train: chunked (bounded RAM)
+# ------------------------------------------------------------------
+class _MemmapSequence(lgb.Sequence):
+    """Lets LightGBM pull rows from an on-disk feature matrix batch by batch."""
+
+    def __init__(self, mat: np.memmap, batch_size: int):
+        self.mat = mat
+        self.batch_size = batch_size
+
+    def __getitem__(self, idx):
+        return np.asarray(self.mat[idx], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.mat)
+
+
+def train_chunked(jobs: pd.DataFrame, workers: pd.DataFrame, chunk_size: int) -> None:
+    x_path = DATASET_PATH.with_suffix(".X.f32")
+    y_path = DATASET_PATH.with_suffix(".y.f32")
+    group_sizes, n_rows = [], 0
+
+    tables = feature_tables(jobs, workers)
+    print(f"🔄 Streaming history in chunks of {chunk_size} rows…")
+    with open(x_path, "wb") as fx, open(y_path, "wb") as fy:
+        for hist in iter_query_chunks(HISTORY_MATCH_CSV, chunk_size):
+            X, y, groups = build_features(hist, *tables)
+            fx.write(X.tobytes())
+            fy.write(y.tobytes())
+            group_sizes.extend(groups.tolist())
+            n_rows += len(X)
+    if not n_rows:
+        raise ValueError("No history rows matched post_job / find_job ids")
+
+    print(f"🔄 Writing LightGBM Dataset ({n_rows} rows) → {DATASET_PATH.name}")
+    X = np.memmap(x_path, dtype=np.float32, mode="r", shape=(n_rows, len(matching.FEATURES)))
+    y = np.memmap(y_path, dtype=np.float32, mode="r", shape=(n_rows,))
+    lgb.Dataset(
+        _MemmapSequence(X, chunk_size), label=y, group=group_sizes,
+        feature_name=matching.FEATURES,
+    ).save_binary(str(DATASET_PATH))
+    del X, y
+    x_path.unlink()
+    y_path.unlink()
+
+    print("🔄 Training LightGBM LambdaRank model…")
+    booster = lgb.train(
+        {"objective": "lambdarank", "metric": "ndcg", "learning_rate": LEARNING_RATE},
+        lgb.Dataset(str(DATASET_PATH)),
+        num_boost_round=N_ESTIMATORS,
+    )
+    booster.save_model(str(MODEL_PATH))
+
+# ------------------------------------------------------------------
+# 6) Main
+# ------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train matching.lgb")
+    parser.add_argument("--chunked", action="store_true",
+                        help="stream history_matches.csv instead of loading it whole")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--procs", type=int, default=matching.ENCODE_PROCS,
+                        help="processes for embedding uncached rows (0 = one per core)")
+    parser.add_argument("--batch-size", type=int, default=matching.ENCODE_BATCH)
+    args = parser.parse_args()
+    matching.ENCODE_PROCS, matching.ENCODE_BATCH = args.procs, args.batch_size
+
+    jobs, workers = load_tables()
+    if args.chunked:
+        train_chunked(jobs, workers, args.chunk_size)
+    else:
+        train_in_memory(jobs, workers)
+    print(f"✅ Saved model → {MODEL_PATH.resolve()}")